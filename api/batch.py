@@ -0,0 +1,131 @@
+"""
+Batch scheduling of many route queries across the providers.
+
+Queries are deduplicated, then every provider drains its own queue with a
+single worker, paced by that provider's rate limiter. Each provider already
+serializes calls behind its lock, so one worker per provider uses all the
+available capacity without queueing on the lock. Queues are interleaved
+round-robin by route, so a route with many date combinations does not starve
+the others. A query is reported as soon as all its providers have answered.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+try:
+    from .rate_limit import IntervalLimiter
+except ImportError:  # pragma: no cover
+    from api.rate_limit import IntervalLimiter
+
+MAX_BATCH_QUERIES = 500
+
+QueryKey = Tuple[str, str, date, date, int]
+ProviderRunner = Callable[[str, "BatchQuery"], Awaitable[Dict[str, Any]]]
+
+
+class BatchQuery(BaseModel):
+    origin: str
+    destination: str
+    departure_date: date
+    return_date: date
+    adults: int = Field(1, ge=1)
+
+    def key(self) -> QueryKey:
+        return (
+            self.origin.strip().upper(),
+            self.destination.strip().upper(),
+            self.departure_date,
+            self.return_date,
+            self.adults,
+        )
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    providers: Optional[List[str]] = None
+
+
+class _PendingQuery:
+    __slots__ = ("query", "indices", "results", "remaining")
+
+    def __init__(self, query: BatchQuery):
+        self.query = query
+        self.indices: List[int] = []
+        self.results: Dict[str, Any] = {}
+        self.remaining = 0
+
+
+def deduplicate(queries: Sequence[BatchQuery]) -> List[_PendingQuery]:
+    """Collapse identical queries, remembering every position they were requested at."""
+    unique: Dict[QueryKey, _PendingQuery] = {}
+    for index, query in enumerate(queries):
+        pending = unique.get(query.key())
+        if pending is None:
+            pending = unique[query.key()] = _PendingQuery(query)
+        pending.indices.append(index)
+    return list(unique.values())
+
+
+def interleave_by_route(pending: Sequence[_PendingQuery]) -> List[_PendingQuery]:
+    """Round-robin the queries across routes, keeping the order within each route."""
+    by_route: Dict[Tuple[str, str], List[_PendingQuery]] = {}
+    for item in pending:
+        key = item.query.key()
+        by_route.setdefault((key[0], key[1]), []).append(item)
+    ordered: List[_PendingQuery] = []
+    routes = list(by_route.values())
+    depth = 0
+    while len(ordered) < len(pending):
+        for route_items in routes:
+            if depth < len(route_items):
+                ordered.append(route_items[depth])
+        depth += 1
+    return ordered
+
+
+async def run_batch(
+    queries: Sequence[BatchQuery],
+    providers: Sequence[str],
+    runner: ProviderRunner,
+    limiters: Mapping[str, IntervalLimiter],
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield one result per unique query, in completion order.
+
+    ``runner(provider, query)`` performs a single provider search and
+    ``limiters`` paces each provider's calls.
+    """
+    ordered = interleave_by_route(deduplicate(queries))
+    for item in ordered:
+        item.remaining = len(providers)
+    completed: "asyncio.Queue[_PendingQuery]" = asyncio.Queue()
+
+    async def _worker(provider: str) -> None:
+        for item in ordered:
+            await limiters[provider].wait()
+            try:
+                result = await runner(provider, item.query)
+            except Exception as exc:
+                result = {"error": f"{provider} search failed: {exc}"}
+            item.results[provider] = result
+            item.remaining -= 1
+            if item.remaining == 0:
+                completed.put_nowait(item)
+
+    workers = [asyncio.create_task(_worker(provider)) for provider in providers]
+    try:
+        for _ in range(len(ordered)):
+            item = await completed.get()
+            yield {
+                "indices": item.indices,
+                "query": item.query.model_dump(mode="json"),
+                "results": item.results,
+            }
+    finally:
+        for worker in workers:
+            worker.cancel()
@@ -0,0 +1,178 @@
+"""
+Pool of long-lived Chrome instances shared by the session captures.
+
+Starting Chrome for every capture costs seconds and hundreds of MB. The pool
+keeps up to ``size`` browsers warm and hands out one isolated browser context
+(separate cookie jar and cache, like an incognito window) per capture. The
+context is wiped and closed when the capture ends, so nothing leaks between
+providers or between captures of the same provider.
+
+Limits:
+    * ``max_contexts`` bounds concurrent captures across the whole pool;
+    * ``max_memory_mb`` bounds the resident memory of the whole pool, summed
+      over every browser's process tree (measured with psutil when
+      installed). It is checked before each context is handed out: idle
+      browsers are recycled, largest first, until the pool fits; when every
+      browser is busy the capture waits for one to be released (the largest
+      is recycled then) instead of opening another context or browser;
+    * ``max_uses`` recycles a browser after that many captures.
+
+selenium_driverless is imported when the first browser is launched, not when
+the pool is created.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+
+if TYPE_CHECKING:  # pragma: no cover
+    from selenium_driverless import webdriver
+    from selenium_driverless.types.context import Context
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - memory limit is skipped without psutil
+    psutil = None
+
+
+class _PooledBrowser:
+    __slots__ = ("driver", "active", "uses", "retired")
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.active = 0
+        self.uses = 0
+        self.retired = False
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        size: int = 1,
+        max_contexts: int = 2,
+        max_memory_mb: Optional[int] = 1024,
+        max_uses: int = 50,
+        headless: bool = True,
+    ):
+        self.size = size
+        self.max_memory_mb = max_memory_mb
+        self.max_uses = max_uses
+        self.headless = headless
+        self._contexts = asyncio.Semaphore(max_contexts)
+        self._browsers: List[_PooledBrowser] = []
+        # Guards launches and is notified whenever a capture releases its browser
+        self._changed = asyncio.Condition()
+
+    def _options(self) -> webdriver.ChromeOptions:
+        from selenium_driverless import webdriver
+
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+        options.add_argument("--disable-dev-shm-usage")
+        return options
+
+    async def _launch(self) -> _PooledBrowser:
+        from selenium_driverless import webdriver
+
+        driver = await webdriver.Chrome(options=self._options())
+        browser = _PooledBrowser(driver)
+        self._browsers.append(browser)
+        return browser
+
+    async def _acquire(self) -> _PooledBrowser:
+        async with self._changed:
+            while not await self._fit_memory_budget():
+                await self._changed.wait()
+            live = [browser for browser in self._browsers if not browser.retired]
+            idle = [browser for browser in live if browser.active == 0]
+            if idle:
+                browser = idle[0]
+            elif len(live) < self.size:
+                browser = await self._launch()
+            else:
+                browser = min(live, key=lambda candidate: candidate.active)
+            browser.active += 1
+            browser.uses += 1
+            return browser
+
+    async def _release(self, browser: _PooledBrowser) -> None:
+        browser.active -= 1
+        if browser.uses >= self.max_uses:
+            browser.retired = True
+        if browser.retired and browser.active == 0:
+            await self._quit(browser)
+        async with self._changed:
+            self._changed.notify_all()
+
+    @staticmethod
+    def _rss(browser: _PooledBrowser) -> int:
+        """Resident memory of a browser's process tree, in bytes (0 when unknown)."""
+        if not browser.driver.browser_pid:
+            return 0
+        try:
+            root = psutil.Process(browser.driver.browser_pid)
+            return sum(process.memory_info().rss for process in [root, *root.children(recursive=True)])
+        except psutil.Error:
+            return 0
+
+    async def _fit_memory_budget(self) -> bool:
+        """
+        Recycle idle browsers, largest first, until the pool's memory fits the budget.
+        False when it still does not because every browser is busy; the largest is then
+        retired, to be recycled as soon as its capture ends.
+        """
+        if psutil is None or self.max_memory_mb is None or not self._browsers:
+            return True
+        browsers = list(self._browsers)
+        usage = await asyncio.to_thread(lambda: [self._rss(browser) for browser in browsers])
+        total = sum(usage)
+        budget = self.max_memory_mb * 1024 * 1024
+        by_size = sorted(zip(usage, browsers), key=lambda entry: entry[0], reverse=True)
+        for rss, browser in by_size:
+            if total <= budget:
+                return True
+            if browser.active == 0:
+                browser.retired = True
+                await self._quit(browser)
+                total -= rss
+        if total <= budget:
+            return True
+        if not any(browser.retired for browser in self._browsers):
+            next(browser for _, browser in by_size if browser in self._browsers).retired = True
+        return False
+
+    async def _quit(self, browser: _PooledBrowser) -> None:
+        if browser in self._browsers:
+            self._browsers.remove(browser)
+        try:
+            await browser.driver.quit()
+        except Exception as exc:
+            print(f"Failed to close pooled browser: {exc}")
+
+    @asynccontextmanager
+    async def context(self) -> AsyncIterator[Context]:
+        """Yield a fresh isolated browser context, wiped and closed on exit."""
+        async with self._contexts:
+            browser = await self._acquire()
+            try:
+                context = await browser.driver.new_context()
+                try:
+                    yield context
+                finally:
+                    try:
+                        await context.execute_cdp_cmd("Network.clearBrowserCache")
+                        await context.delete_all_cookies()
+                        await context.close()
+                    except Exception as exc:
+                        # A context we cannot clean must not be reused.
+                        print(f"Failed to clean browser context: {exc}")
+                        browser.retired = True
+            finally:
+                await self._release(browser)
+
+    async def close(self) -> None:
+        for browser in list(self._browsers):
+            await self._quit(browser)
@@ -0,0 +1,117 @@
+"""
+In-memory caches of provider results.
+
+``ResultCache`` keeps the last normalized result per provider query, used to
+keep answering a provider while it cannot be queried (session being
+re-captured, circuit open) instead of failing or launching more browsers.
+
+``LegCache`` keeps fresh prices per leg (one direction of a route on one
+day). Providers price the outbound and inbound legs independently, so a
+round trip can be answered from two cached legs that came from different
+searches, e.g. BEL->GRU 03/10-03/15 and 03/10-03/20 share the outbound leg.
+
+``NegativeCache`` remembers for a short while the queries that failed or
+found no flights, so repeating a dead query does not scrape again.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    """Bounded LRU mapping of query keys to (stored_at, payload)."""
+
+    def __init__(self, max_entries: int = 1024, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Return (age_seconds, payload) for the key, or None when absent."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        stored_at, payload = entry
+        return self._clock() - stored_at, payload
+
+    async def lookup(self, key: Hashable) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """``get`` for the engine; caches backed by storage read it off the event loop."""
+        return self.get(key)
+
+    def set(self, key: Hashable, payload: Dict[str, Any], stored_at: Optional[float] = None) -> None:
+        self._entries[key] = (self._clock() if stored_at is None else stored_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LegCache:
+    """
+    Fresh leg prices keyed by (provider, origin, destination, day, direction, adults).
+
+    ``origin``/``destination`` are those of the round trip the leg was priced in
+    (an inbound leg flies destination -> origin). Each entry holds the price of
+    every kind the provider quotes ("miles"/"money", None when not offered) and
+    the leg's flights when the day was the one requested; days only seen in a
+    response's flexible-date columns have no flights.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 8192, clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self._entries = ResultCache(max_entries, clock)
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Return (age_seconds, entry) while the leg is fresh, else None."""
+        cached = self._entries.get(key)
+        if cached is None or cached[0] > self.ttl:
+            return None
+        return cached
+
+    def set(self, key: Hashable, prices: Dict[str, Optional[float]], flights: Optional[list] = None) -> None:
+        if flights is None:
+            # A flexible-date column must not replace a fresh leg that has its flights
+            current = self.get(key)
+            if current is not None and current[1]["flights"] is not None:
+                return
+        self._entries.set(key, {"prices": prices, "flights": flights})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NegativeCache:
+    """Failed and empty results per query key, each kept for its own short TTL."""
+
+    def __init__(
+        self,
+        error_ttl: float = 60.0,
+        empty_ttl: float = 300.0,
+        max_entries: int = 4096,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.error_ttl = error_ttl
+        self.empty_ttl = empty_ttl
+        self._entries = ResultCache(max_entries, clock)
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Return (age_seconds, result) while the entry is within its TTL, else None."""
+        cached = self._entries.get(key)
+        if cached is None:
+            return None
+        age, entry = cached
+        if age > entry["ttl"]:
+            return None
+        return age, entry["result"]
+
+    def set(self, key: Hashable, result: Dict[str, Any], empty: bool = False) -> None:
+        self._entries.set(key, {"ttl": self.empty_ttl if empty else self.error_ttl, "result": result})
+
+    def __len__(self) -> int:
+        return len(self._entries)
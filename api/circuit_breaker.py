@@ -0,0 +1,89 @@
+"""
+Per-provider circuit breaker.
+
+After ``failure_threshold`` consecutive failures the breaker opens and the API
+answers for that provider immediately instead of waiting on a broken upstream.
+Once ``reset_timeout`` has elapsed a single probe runs in the background; a
+successful probe closes the breaker, a failed one keeps it open for another
+``reset_timeout``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def allow_request(self) -> bool:
+        """Return True when callers may hit the provider directly."""
+        return self.state == CLOSED
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = self._clock()
+
+    def probe_in_background(self, probe: Callable[[], Awaitable[bool]]) -> None:
+        """
+        Schedule a recovery probe when the breaker is open and cooled down.
+
+        ``probe`` must return True when the provider answered successfully. At
+        most one probe runs at a time; callers never wait for it.
+        """
+        if self.state != OPEN or self._probe_task is not None:
+            return
+        if self.opened_at is not None and self._clock() - self.opened_at < self.reset_timeout:
+            return
+        self.state = HALF_OPEN
+        self._probe_task = asyncio.get_running_loop().create_task(self._run_probe(probe))
+
+    async def _run_probe(self, probe: Callable[[], Awaitable[bool]]) -> None:
+        try:
+            succeeded = await probe()
+        except Exception:
+            succeeded = False
+        finally:
+            self._probe_task = None
+        if succeeded:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Serializable view of the breaker for API responses."""
+        retry_in = None
+        if self.state == OPEN and self.opened_at is not None:
+            retry_in = max(0.0, round(self.reset_timeout - (self._clock() - self.opened_at), 1))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in_seconds": retry_in,
+        }
@@ -0,0 +1,141 @@
+"""
+Response compression: Brotli when the client accepts it, GZip otherwise.
+
+Brotli needs the optional ``brotli`` package; without it every client gets
+GZip. Streamed bodies (e.g. the NDJSON of ``/search/batch``) are flushed per
+chunk, so lines still reach the client as soon as they are produced.
+
+Each content-coding is a different representation, so a strong ETag leaves
+with the coding appended (``"tag"`` -> ``"tag-br"``). On the way in, the
+suffix of the negotiated coding is removed from If-None-Match, so endpoints
+compare plain tags; a tag of another coding never matches.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is skipped without the package
+    brotli = None
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    """Whether ``coding`` is listed in Accept-Encoding with a non-zero q-value."""
+    for item in accept_encoding.lower().split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        if name != coding:
+            continue
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    return float(param[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _coded_etag(etag: str, coding: str) -> str:
+    """ETag of the ``coding`` representation; weak tags already tolerate encoding changes."""
+    if not etag.startswith('"'):
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+
+def _strip_coding(if_none_match: str, coding: str) -> Tuple[str, Dict[str, str]]:
+    """
+    If-None-Match with the ``coding`` suffix removed from its tags, and a map from
+    each plain tag back to the tag the client sent.
+    """
+    suffix = f'-{coding}"'
+    tags = []
+    sent: Dict[str, str] = {}
+    for tag in (part.strip() for part in if_none_match.split(",")):
+        if tag.endswith(suffix):
+            plain = tag[: -len(suffix)] + '"'
+            sent[plain.removeprefix("W/")] = tag
+            tag = plain
+        tags.append(tag)
+    return ", ".join(tags), sent
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 5, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 6, brotli_quality: int = 5):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":  # pragma: no cover
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        accept_encoding = request_headers.get("Accept-Encoding", "")
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            coding = "br"
+            responder = BrotliResponder(
+                self.app,
+                self.minimum_size,
+                quality=self.brotli_quality,
+                exclude_content_types=self.exclude_content_types,
+            )
+        elif _accepts(accept_encoding, "gzip"):
+            coding = "gzip"
+            responder = GZipResponder(
+                self.app,
+                self.minimum_size,
+                compresslevel=self.compresslevel,
+                thread_minimum_size=self.thread_minimum_size,
+                exclude_content_types=self.exclude_content_types,
+            )
+        else:
+            coding = "identity"
+            responder = IdentityResponder(
+                self.app, self.minimum_size, exclude_content_types=self.exclude_content_types
+            )
+
+        sent: Dict[str, str] = {}
+        if_none_match = request_headers.get("If-None-Match")
+        if if_none_match is not None and coding != "identity":
+            if_none_match, sent = _strip_coding(if_none_match, coding)
+            scope = {
+                **scope,
+                "headers": [(name, value) for name, value in scope["headers"] if name != b"if-none-match"]
+                + [(b"if-none-match", if_none_match.encode("latin-1"))],
+            }
+
+        async def send_with_coded_etag(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                encoding = headers.get("content-encoding")
+                if etag is not None and encoding:
+                    headers["etag"] = _coded_etag(etag, encoding)
+                elif etag is not None and message["status"] == 304 and etag in sent:
+                    # Confirm the representation the client holds, under the tag it sent
+                    headers["etag"] = sent[etag]
+            await send(message)
+
+        await responder(scope, receive, send_with_coded_etag)
@@ -0,0 +1,59 @@
+"""
+Strong ETags and conditional GET for responses derived from static data.
+
+``/history`` only changes when the SQLite file changes and the city tables
+never change at runtime, so their ETags are built from the file's stat()
+signature and a digest of ``cities`` -- both known without opening SQLite.
+A matching ``If-None-Match`` is answered with an empty 304. The tags built
+here name the identity representation; ``compression.CompressionMiddleware``
+appends the content-coding to them for compressed responses.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request, Response
+
+try:
+    from .cities import CIDADES, CITY_ALIASES
+except ImportError:  # pragma: no cover
+    from api.cities import CIDADES, CITY_ALIASES
+
+CITIES_VERSION = hashlib.sha256(
+    json.dumps([CIDADES, CITY_ALIASES], sort_keys=True, ensure_ascii=False).encode("utf-8")
+).hexdigest()[:16]
+
+
+def database_version(path: Path) -> str:
+    """Signature of the database file that changes whenever its contents are rewritten."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def strong_etag(*parts: str) -> str:
+    digest = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def _opaque_tags(header: str) -> set[str]:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """Return a 304 response when the client already holds ``etag``, else None."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    tags = _opaque_tags(header)
+    if "*" not in tags and etag not in tags:
+        return None
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
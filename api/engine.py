@@ -0,0 +1,496 @@
+"""
+Execution engine shared by every provider search.
+
+The engine runs the steps of a ``providers.Provider`` under that provider's
+lock, behind its circuit breaker, with background session refresh, the
+last-good-result cache and the Prometheus/Server-Timing instrumentation.
+With a ``SessionStore`` the captured sessions are also shared with the other
+worker processes: a worker adopts a session another one captured instead of
+opening its own browser. With a ``LegCache`` every result also feeds
+per-leg prices, and a round trip whose two legs are both fresh there is
+answered without a provider call. Queries that fail validation are
+answered at once, and with a ``NegativeCache`` so are queries that recently
+failed or found no flights. With a ``RouteGraph`` providers that do not
+serve a route are skipped. Callers that accept slightly old prices can ask
+for stale-while-revalidate: a cached result within the stale limit is
+answered at once and one background search per query refreshes it. With
+per-provider ``AdaptiveTokenBucket`` limiters
+every upstream call first waits for a token, and its outcome (throttled,
+challenged, slow) adjusts the rate all workers share. With a ``RawArchive``
+every raw upstream response is also archived, in the background.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import date
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+try:
+    from . import metrics, timing
+    from .cache import LegCache, NegativeCache, ResultCache
+    from .circuit_breaker import CircuitBreaker
+    from .providers import Provider, ProviderRequest, sum_optional
+    from .rate_limit import AdaptiveTokenBucket
+    from .raw_archive import RawArchive
+    from .route_graph import RouteGraph
+    from .session_store import SessionStore
+    from .sessions import SessionRefresher
+    from .validation import search_error
+except ImportError:  # pragma: no cover
+    from api import metrics, timing
+    from api.cache import LegCache, NegativeCache, ResultCache
+    from api.circuit_breaker import CircuitBreaker
+    from api.providers import Provider, ProviderRequest, sum_optional
+    from api.rate_limit import AdaptiveTokenBucket
+    from api.raw_archive import RawArchive
+    from api.route_graph import RouteGraph
+    from api.session_store import SessionStore
+    from api.sessions import SessionRefresher
+    from api.validation import search_error
+
+SEARCH_ENDPOINT = "/search"
+
+
+@contextmanager
+def timed_phase(
+    provider: str, phase: str, histogram: metrics.Histogram, endpoint: str = SEARCH_ENDPOINT
+) -> Iterator[None]:
+    """Record a phase both in the Prometheus histogram and in the Server-Timing spans."""
+    with histogram.time(provider=provider, endpoint=endpoint), timing.span(f"{provider}-{phase}"):
+        yield
+
+
+def record_error(provider: str, error_type: str, endpoint: str = SEARCH_ENDPOINT) -> None:
+    metrics.ERRORS.inc(provider=provider, endpoint=endpoint, type=error_type)
+
+
+def upstream_failed(result: Mapping[str, Any]) -> bool:
+    """
+    Whether the provider itself failed (transport error, timeout, rejected or throttled
+    request). Responses without usable fares are answers, not failures, and must not
+    open the circuit for everyone.
+    """
+    return "error" in result and not result.get("extraction_error")
+
+
+class SearchEngine:
+    def __init__(
+        self,
+        providers: Sequence[Provider],
+        cache: ResultCache,
+        session_store: Optional[SessionStore] = None,
+        limiters: Optional[Mapping[str, AdaptiveTokenBucket]] = None,
+        leg_cache: Optional[LegCache] = None,
+        negative_cache: Optional[NegativeCache] = None,
+        route_graph: Optional[RouteGraph] = None,
+        archive: Optional[RawArchive] = None,
+    ):
+        self.providers: Dict[str, Provider] = {provider.name: provider for provider in providers}
+        self.cache = cache
+        self.session_store = session_store
+        self.limiters: Mapping[str, AdaptiveTokenBucket] = limiters or {}
+        self.leg_cache = leg_cache
+        self.negative_cache = negative_cache
+        self.route_graph = route_graph
+        self.archive = archive
+        self._archive_tasks: Set[asyncio.Task] = set()
+        # Background searches refreshing stale results, one per query key
+        self._revalidations: Dict[Tuple[Any, ...], asyncio.Task] = {}
+        # Version of the shared session each provider is currently using
+        self._session_versions: Dict[str, Optional[int]] = {}
+        self.locks: Dict[str, asyncio.Lock] = {name: asyncio.Lock() for name in self.providers}
+        self.breakers: Dict[str, CircuitBreaker] = {name: CircuitBreaker(name) for name in self.providers}
+        self.refreshers: Dict[str, SessionRefresher] = {
+            name: SessionRefresher(
+                name,
+                self.locks[name],
+                provider.invalidate_session,
+                lambda request, provider=provider: self._refresh_session(provider, request),
+            )
+            for name, provider in self.providers.items()
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.providers
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.providers)
+
+    def for_route(self, origin: str, destination: str) -> List[str]:
+        """Provider names, those known to serve the route first."""
+        if self.route_graph is None:
+            return list(self.providers)
+        return self.route_graph.rank(list(self.providers), origin, destination)
+
+    def breaker_snapshots(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+    @asynccontextmanager
+    async def _lock(self, name: str) -> AsyncIterator[None]:
+        """Hold a provider lock, recording how long the caller waited for it."""
+        start = time.perf_counter()
+        async with self.locks[name]:
+            waited = time.perf_counter() - start
+            metrics.LOCK_WAIT_SECONDS.observe(waited, provider=name, endpoint=SEARCH_ENDPOINT)
+            timing.record(f"{name}-lock", waited)
+            yield
+
+    async def _adopt_shared_session(self, provider: Provider) -> bool:
+        """Load the session published by another worker, if there is one."""
+        shared = await asyncio.to_thread(self.session_store.load, provider.name)
+        if shared is None:
+            return False
+        version, session = shared
+        provider.load_session(session)
+        self._session_versions[provider.name] = version
+        return provider.has_session()
+
+    async def _capture_shared_session(self, provider: Provider, request: ProviderRequest) -> None:
+        """Capture under the cross-process lease, or wait for the worker holding it."""
+        store = self.session_store
+        while not await asyncio.to_thread(store.try_acquire, provider.name):
+            await asyncio.sleep(store.poll_interval)
+            if await self._adopt_shared_session(provider):
+                return
+        try:
+            await provider.capture_session(request)
+            session = provider.export_session()
+            if session is not None:
+                self._session_versions[provider.name] = await asyncio.to_thread(
+                    store.save, provider.name, session
+                )
+        finally:
+            await asyncio.to_thread(store.release, provider.name)
+
+    async def _ensure_session(self, provider: Provider, request: ProviderRequest) -> None:
+        """Capture a browser session when the provider has none yet, timing the capture."""
+        if provider.has_session():
+            return
+        if self.session_store is not None and await self._adopt_shared_session(provider):
+            return
+        with timed_phase(provider.name, "capture", metrics.SESSION_CAPTURE_SECONDS):
+            if self.session_store is None:
+                await provider.capture_session(request)
+            else:
+                await self._capture_shared_session(provider, request)
+
+    async def _refresh_session(self, provider: Provider, request: ProviderRequest) -> None:
+        """Replace a rejected session: withdraw it from the shared store, then adopt or capture a new one."""
+        if self.session_store is not None:
+            await asyncio.to_thread(
+                self.session_store.discard, provider.name, self._session_versions.pop(provider.name, None)
+            )
+        await self._ensure_session(provider, request)
+
+    def _record_upstream(self, provider: Provider) -> None:
+        """Publish the HTTP and JSON parse durations measured by the scraper, when available."""
+        elapsed = provider.last_timings.get("http")
+        if elapsed is not None:
+            metrics.PROVIDER_HTTP_SECONDS.observe(elapsed, provider=provider.name, endpoint=SEARCH_ENDPOINT)
+        timing.record(f"{provider.name}-http", elapsed)
+        timing.record(f"{provider.name}-parse", provider.last_timings.get("parse"))
+
+    async def _fetch(self, provider: Provider, request: ProviderRequest) -> Dict[str, Any]:
+        """Fetch once the provider's shared limiter allows it, then report how the upstream reacted."""
+        limiter = self.limiters.get(provider.name)
+        if limiter is None:
+            return await provider.fetch(request)
+        start = time.perf_counter()
+        await limiter.acquire()
+        timing.record(f"{provider.name}-ratelimit", time.perf_counter() - start)
+        flight_data = await provider.fetch(request)
+        await limiter.feedback(
+            throttled=bool(flight_data.get("throttled")),
+            challenged=bool(flight_data.get("session_rejected")),
+            latency=provider.last_timings.get("http"),
+        )
+        return flight_data
+
+    def _handle_upstream_error(self, provider: Provider, flight_data: Dict[str, Any], request: ProviderRequest) -> None:
+        """Count an upstream failure, re-capturing the session in the background when it was rejected."""
+        if flight_data.get("session_rejected"):
+            record_error(provider.name, "session_rejected")
+            self.refreshers[provider.name].trigger(request)
+        elif flight_data.get("throttled"):
+            record_error(provider.name, "throttled")
+        else:
+            record_error(provider.name, "upstream")
+
+    async def _cached_fallback(self, key: Tuple[Any, ...], origin: str, destination: str, error: str) -> Dict[str, Any]:
+        """Serve the last good result for the query flagged as stale, or the error when none exists."""
+        cached = await self.cache.lookup(key)
+        if cached is None:
+            return {"route": f"{origin} -> {destination}", "error": error}
+        age, payload = cached
+        return {**payload, "stale": True, "age_seconds": round(age, 1)}
+
+    def _archive_response(self, name: str, request: ProviderRequest, days: Tuple[str, str], flight_data: Dict[str, Any]) -> None:
+        """Hash, compress and store the raw response in a worker thread, off the request path."""
+
+        async def _store() -> None:
+            try:
+                await asyncio.to_thread(
+                    self.archive.store, name, request.origin, request.destination, days[0], days[1], flight_data
+                )
+            except Exception as exc:
+                print(f"Archiving the {name} response failed: {exc}")
+
+        task = asyncio.get_running_loop().create_task(_store())
+        self._archive_tasks.add(task)
+        task.add_done_callback(self._archive_tasks.discard)
+
+    async def _run(self, provider: Provider, request: ProviderRequest, days: Tuple[str, str]) -> Dict[str, Any]:
+        """Capture (if needed), fetch and extract one provider search."""
+        name = provider.name
+        header = {
+            "route": f"{request.origin} -> {request.destination}",
+            "departure": request.departure,
+            "return": request.return_date,
+        }
+
+        async with self._lock(name):
+            await self._ensure_session(provider, request)
+            flight_data = await self._fetch(provider, request)
+            self._record_upstream(provider)
+
+        if "error" in flight_data:
+            self._handle_upstream_error(provider, flight_data, request)
+            return {
+                **header,
+                "error": flight_data["error"],
+                "session_rejected": flight_data.get("session_rejected", False),
+            }
+
+        if self.archive is not None:
+            self._archive_response(name, request, days, flight_data)
+
+        with timed_phase(name, "extract", metrics.EXTRACTION_SECONDS):
+            flight_info = provider.extract(flight_data)
+        if "error" in flight_info:
+            # The provider answered; its response just had no usable fares (e.g. sold out)
+            record_error(name, "extraction")
+            return {**header, "error": flight_info["error"], "extraction_error": True}
+
+        return {
+            **header,
+            **provider.summarize(flight_info),
+            "legs": provider.leg_prices(request, flight_info),
+            "flights": {
+                "outbound": flight_info.get("outbound_flights", []),
+                "inbound": flight_info.get("inbound_flights", []),
+            },
+        }
+
+    def _store_legs(self, name: str, origin: str, destination: str, adults: int, days: Tuple[str, str], result: Dict[str, Any]) -> None:
+        """Cache every leg price of a fresh result; the requested days also keep their flights."""
+        per_day: Dict[Tuple[str, str], Dict[str, Optional[float]]] = {}
+        kinds = list(result.get("legs", {}))
+        for kind, directions in result.get("legs", {}).items():
+            for direction, prices in directions.items():
+                for day, price in prices.items():
+                    per_day.setdefault((direction, day), dict.fromkeys(kinds))[kind] = price
+        requested = {("outbound", days[0]), ("inbound", days[1])}
+        for direction, day in requested:
+            # The requested day is authoritative even for the kinds it has no price for
+            per_day.setdefault((direction, day), dict.fromkeys(kinds))
+        for (direction, day), prices in per_day.items():
+            flights = result["flights"][direction] if (direction, day) in requested else None
+            self.leg_cache.set((name, origin, destination, day, direction, adults), prices, flights)
+
+    def _compose_from_legs(
+        self, provider: Provider, origin: str, destination: str, departure_date: date, return_date: date, adults: int
+    ) -> Optional[Dict[str, Any]]:
+        """Answer the round trip from two fresh cached legs, or None when either is missing."""
+        days = (departure_date.isoformat(), return_date.isoformat())
+        legs = {}
+        for direction, day in zip(("outbound", "inbound"), days):
+            cached = self.leg_cache.get((provider.name, origin.upper(), destination.upper(), day, direction, adults))
+            if cached is None:
+                metrics.CACHE_LOOKUPS.inc(provider=provider.name, endpoint=SEARCH_ENDPOINT, cache="leg", result="miss")
+                return None
+            legs[direction] = cached
+        metrics.CACHE_LOOKUPS.inc(provider=provider.name, endpoint=SEARCH_ENDPOINT, cache="leg", result="hit")
+
+        request = provider.build_request(origin, destination, departure_date, return_date, adults)
+        outbound_prices = legs["outbound"][1]["prices"]
+        inbound_prices = legs["inbound"][1]["prices"]
+        kinds = sorted(set(outbound_prices) | set(inbound_prices))
+        return {
+            "route": f"{request.origin} -> {request.destination}",
+            "departure": request.departure,
+            "return": request.return_date,
+            "outbound": {kind: outbound_prices.get(kind) for kind in kinds},
+            "inbound": {kind: inbound_prices.get(kind) for kind in kinds},
+            "total": {kind: sum_optional([outbound_prices.get(kind), inbound_prices.get(kind)]) for kind in kinds},
+            "legs": {
+                kind: {
+                    "outbound": {days[0]: outbound_prices[kind]} if outbound_prices.get(kind) is not None else {},
+                    "inbound": {days[1]: inbound_prices[kind]} if inbound_prices.get(kind) is not None else {},
+                }
+                for kind in kinds
+            },
+            "flights": {
+                direction: legs[direction][1]["flights"] or [] for direction in ("outbound", "inbound")
+            },
+            "composed_from_legs": True,
+            "age_seconds": round(max(legs["outbound"][0], legs["inbound"][0]), 1),
+        }
+
+    def _remember(
+        self, name: str, key: Tuple[Any, ...], origin: str, destination: str, departure_date: date, result: Dict[str, Any]
+    ) -> None:
+        """Cache an answer of a healthy provider: fares in the result and leg caches, no fares in the negative one."""
+        if "error" in result:
+            if self.negative_cache is not None:
+                self.negative_cache.set(key, result, empty=True)
+            return
+        self.cache.set(key, result)
+        if self.leg_cache is not None:
+            self._store_legs(name, key[1], key[2], key[5], key[3:5], result)
+        empty = all(value is None for value in result["total"].values())
+        if self.negative_cache is not None and empty:
+            # No flights for these dates; do not scrape them again for a while
+            self.negative_cache.set(key, result, empty=True)
+        if self.route_graph is not None:
+            self.route_graph.observe(name, origin, destination, departure_date, served=not empty)
+
+    def _revalidate(self, key: Tuple[Any, ...], *search_args: Any) -> None:
+        """Refresh a stale result in the background, unless a refresh of that query is already running."""
+        if key in self._revalidations:
+            return
+
+        async def _refresh() -> None:
+            try:
+                # fresh_ttl=0: cached legs must not answer the refresh itself
+                await self.search(*search_args, fresh_ttl=0.0)
+            except Exception as exc:
+                print(f"Background refresh of {key} failed: {exc}")
+            finally:
+                self._revalidations.pop(key, None)
+
+        self._revalidations[key] = asyncio.get_running_loop().create_task(_refresh())
+
+    async def search(
+        self,
+        name: str,
+        origin: str,
+        destination: str,
+        departure_date: date,
+        return_date: date,
+        adults: int = 1,
+        fresh_ttl: Optional[float] = None,
+        stale_ttl: Optional[float] = None,
+        admit: Optional[Callable[[], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run a provider search through its circuit breaker.
+        While the breaker is open the provider is answered immediately with an error
+        and a recovery probe for the same route is scheduled in the background.
+
+        With ``fresh_ttl``/``stale_ttl`` (stale-while-revalidate) the last good
+        result of the query, or the round trip composed from cached legs, is
+        returned as is while younger than ``fresh_ttl``; up to ``stale_ttl`` it is
+        returned flagged stale and refreshed in the background.
+
+        ``admit`` is called only when the search is about to go upstream (no cache
+        answered it); when it returns False the search is deferred instead.
+        """
+        provider = self.providers[name]
+        breaker = self.breakers[name]
+        key = (name, origin.upper(), destination.upper(), departure_date.isoformat(), return_date.isoformat(), adults)
+
+        invalid = search_error(origin, destination, departure_date, return_date, adults)
+        if invalid is not None:
+            record_error(name, "invalid_query")
+            return {"route": f"{origin} -> {destination}", "error": invalid, "invalid": True}
+
+        composed = None
+        if self.leg_cache is not None:
+            composed = self._compose_from_legs(provider, origin, destination, departure_date, return_date, adults)
+            if composed is not None and (fresh_ttl is None or composed["age_seconds"] <= fresh_ttl):
+                return composed
+
+        if stale_ttl is not None:
+            cached = await self.cache.lookup(key)
+            if composed is not None and (cached is None or composed["age_seconds"] < cached[0]):
+                # Legs past fresh_ttl are stale like any other cached result
+                cached = (composed["age_seconds"], composed)
+            if cached is not None and cached[0] <= stale_ttl:
+                age, payload = cached
+                fresh = fresh_ttl is not None and age <= fresh_ttl
+                metrics.CACHE_LOOKUPS.inc(
+                    provider=name, endpoint=SEARCH_ENDPOINT, cache="result", result="hit" if fresh else "stale"
+                )
+                if fresh:
+                    return {**payload, "age_seconds": round(age, 1)}
+                self._revalidate(key, name, origin, destination, departure_date, return_date, adults)
+                return {**payload, "stale": True, "age_seconds": round(age, 1), "revalidating": True}
+            metrics.CACHE_LOOKUPS.inc(provider=name, endpoint=SEARCH_ENDPOINT, cache="result", result="miss")
+
+        if self.negative_cache is not None:
+            dead = self.negative_cache.get(key)
+            metrics.CACHE_LOOKUPS.inc(
+                provider=name, endpoint=SEARCH_ENDPOINT, cache="negative", result="miss" if dead is None else "hit"
+            )
+            if dead is not None:
+                age, payload = dead
+                return {**payload, "negative_cache": True, "age_seconds": round(age, 1)}
+
+        if self.route_graph is not None and not self.route_graph.should_query(name, origin, destination):
+            record_error(name, "route_not_served")
+            return {
+                "route": f"{origin} -> {destination}",
+                "error": f"{name} has no known flights on this route",
+                "route_not_served": True,
+            }
+
+        if self.refreshers[name].refreshing:
+            return await self._cached_fallback(key, origin, destination, f"{name} session is being refreshed")
+
+        request = provider.build_request(origin, destination, departure_date, return_date, adults)
+
+        async def _attempt() -> Dict[str, Any]:
+            try:
+                return await self._run(provider, request, key[3:5])
+            except Exception as exc:
+                record_error(name, "exception")
+                return {
+                    "route": f"{origin} -> {destination}",
+                    "error": f"{name} search failed: {exc}",
+                }
+
+        if not breaker.allow_request():
+            async def _probe() -> bool:
+                result = await _attempt()
+                if result.get("session_rejected"):
+                    # Reachable, only our cookies were refused: the provider is up
+                    return True
+                if upstream_failed(result):
+                    return False
+                self._remember(name, key, origin, destination, departure_date, result)
+                return True
+
+            breaker.probe_in_background(_probe)
+            record_error(name, "circuit_open")
+            return await self._cached_fallback(
+                key, origin, destination, f"{name} is temporarily unavailable (circuit {breaker.state})"
+            )
+
+        if admit is not None and not admit():
+            return {"route": f"{origin} -> {destination}", "error": f"{name} request budget exhausted", "deferred": True}
+
+        result = await _attempt()
+        if result.get("session_rejected"):
+            # The provider is up but refused our cookies; the refresher handles it.
+            return await self._cached_fallback(key, origin, destination, result["error"])
+        if upstream_failed(result):
+            breaker.record_failure()
+            if self.negative_cache is not None:
+                self.negative_cache.set(key, result)
+        else:
+            breaker.record_success()
+            self._remember(name, key, origin, destination, departure_date, result)
+        return result
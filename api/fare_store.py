@@ -0,0 +1,202 @@
+"""
+Provider results persisted in a local SQLite file.
+
+The in-memory ``ResultCache`` is lost on restart and private to one uvicorn
+worker. ``PersistentResultCache`` keeps it as a first level in front of a
+``FareStore``: results are written to both, and a memory miss (or a memory
+entry older than ``memory_ttl``, since another worker may have stored a
+fresher one) is looked up on disk and the newer copy kept. Every worker and
+every restart therefore sees the results any of them fetched. The disk is
+only touched from worker threads, and writes happen in the background, so a
+worker holding SQLite's lock never stalls another worker's event loop.
+
+The store keeps one row per query key with its stored and last-access
+times. Rows older than ``ttl`` are never returned and are purged; past
+``max_entries`` the least recently used rows are evicted. Reads do not
+write: the access times they refresh are batched into the next write. The
+file runs in WAL mode, so readers in other processes never block, and
+writes take SQLite's lock with ``BEGIN IMMEDIATE``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Set, Tuple
+
+try:
+    from .cache import ResultCache
+except ImportError:  # pragma: no cover
+    from api.cache import ResultCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fare_cache (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fare_cache_accessed ON fare_cache(accessed_at);
+"""
+
+# Last-access times are only refreshed when older than this, keeping the batched updates small
+ACCESS_RESOLUTION_SECONDS = 60.0
+
+
+def _plain(value: Any) -> Any:
+    """JSON-ready copy of a result: flight and fare records become objects."""
+    if hasattr(value, "_asdict"):
+        return {name: _plain(item) for name, item in value._asdict().items()}
+    if isinstance(value, dict):
+        return {name: _plain(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+class FareStore:
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = 86400.0,
+        max_entries: int = 20000,
+        evict_every: int = 64,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._clock = clock
+        self._writes = 0
+        # key -> last read time, flushed to accessed_at with the next write
+        self._touched: Dict[str, float] = {}
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            if not self._initialized:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            if immediate:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            else:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key, default=str)
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, float, Dict[str, Any]]]:
+        """Return (stored_at, age_seconds, payload) for a key younger than the TTL, or None."""
+        now = self._clock()
+        text_key = self._key(key)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, stored_at, accessed_at FROM fare_cache WHERE key = ?", (text_key,)
+            ).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            return None
+        if now - row[2] > ACCESS_RESOLUTION_SECONDS:
+            self._touched[text_key] = now
+        return row[1], now - row[1], json.loads(row[0])
+
+    def set(self, key: Hashable, payload: Dict[str, Any]) -> None:
+        now = self._clock()
+        text_key = self._key(key)
+        touched, self._touched = self._touched, {}
+        touched.pop(text_key, None)
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fare_cache (key, payload, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (text_key, json.dumps(_plain(payload), ensure_ascii=False), now, now),
+            )
+            if touched:
+                conn.executemany(
+                    "UPDATE fare_cache SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                    [(accessed_at, text_key) for text_key, accessed_at in touched.items()],
+                )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Purge expired rows, then the least recently used ones beyond the size cap."""
+        conn.execute("DELETE FROM fare_cache WHERE stored_at < ?", (now - self.ttl,))
+        conn.execute(
+            """
+            DELETE FROM fare_cache WHERE key IN (
+                SELECT key FROM fare_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM fare_cache").fetchone()[0]
+
+
+class PersistentResultCache(ResultCache):
+    """``ResultCache`` backed by a ``FareStore`` shared with the other workers."""
+
+    def __init__(
+        self,
+        store: FareStore,
+        max_entries: int = 1024,
+        memory_ttl: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        super().__init__(max_entries, clock)
+        self.store = store
+        self.memory_ttl = memory_ttl
+        self._pending_writes: Set[asyncio.Task] = set()
+
+    async def lookup(self, key: Hashable) -> Optional[Tuple[float, Dict[str, Any]]]:
+        cached = super().get(key)
+        if cached is not None and cached[0] <= self.memory_ttl:
+            return cached
+        try:
+            stored = await asyncio.to_thread(self.store.get, key)
+        except sqlite3.Error as exc:
+            print(f"Fare cache read failed: {exc}")
+            return cached
+        if stored is None or (cached is not None and stored[1] >= cached[0]):
+            return cached
+        stored_at, age, payload = stored
+        super().set(key, payload, stored_at=stored_at)
+        return age, payload
+
+    def _write(self, key: Hashable, payload: Dict[str, Any]) -> None:
+        try:
+            self.store.set(key, payload)
+        except sqlite3.Error as exc:
+            # The memory level still has it; the other workers will fetch their own
+            print(f"Fare cache write failed: {exc}")
+
+    def set(self, key: Hashable, payload: Dict[str, Any], stored_at: Optional[float] = None) -> None:
+        super().set(key, payload, stored_at)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(key, payload)
+            return
+        task = loop.create_task(asyncio.to_thread(self._write, key, payload))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
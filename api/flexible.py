@@ -0,0 +1,146 @@
+"""
+Flexible-date search: collect per-day leg prices once, then pair them.
+
+The valid (departure, return) combinations come from the same
+``date_pairs`` the scrapers use, so the window width, the allowed weekdays
+and the stay limits mean the same everywhere. Instead of searching every
+combination, each provider is searched until every day of both windows has
+been seen at least once (Azul answers with the neighbouring days of each
+leg, so usually one search is enough; Smiles needs about one search per day,
+each search a valid combination covering an unseen departure day and an
+unseen return day when there is one). The collected leg prices are then
+handed to the ``pairing`` solvers.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from azul_scraper.date_windows import date_pairs, format_dates
+
+try:
+    from .pairing import best_by_stay, cheapest_round_trips
+except ImportError:  # pragma: no cover
+    from api.pairing import best_by_stay, cheapest_round_trips
+
+# engine.search(provider, origin, destination, departure_date, return_date, adults)
+SearchFn = Callable[[str, str, str, date, date, int], Awaitable[Dict[str, Any]]]
+
+Legs = Dict[str, Dict[str, Dict[str, float]]]
+
+
+def _merge_legs(legs: Legs, found: Legs) -> None:
+    for kind, directions in found.items():
+        for direction, prices in directions.items():
+            merged = legs.setdefault(kind, {}).setdefault(direction, {})
+            for day, price in prices.items():
+                if price < merged.get(day, float("inf")):
+                    merged[day] = price
+
+
+def _next_pair(pairs: List[Tuple[str, str]], seen: Dict[str, Set[str]]) -> Optional[Tuple[str, str]]:
+    """Next valid (departure, return) to search, covering an unseen day of each leg when possible."""
+    fallback = None
+    for departure, return_day in pairs:
+        new_departure = departure not in seen["outbound"]
+        new_return = return_day not in seen["inbound"]
+        if new_departure and new_return:
+            return departure, return_day
+        if fallback is None and (new_departure or new_return):
+            fallback = departure, return_day
+    return fallback
+
+
+async def flexible_search(
+    search: SearchFn,
+    provider: str,
+    origin: str,
+    destination: str,
+    departure_date: date,
+    return_date: date,
+    adults: int = 1,
+    width: int = 3,
+    min_stay: int = 0,
+    max_stay: Optional[int] = None,
+    departure_weekdays: Optional[Iterable[int]] = None,
+    return_weekdays: Optional[Iterable[int]] = None,
+    top_k: int = 5,
+    max_searches: int = 8,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Cheapest round trip per stay length and the ``top_k`` cheapest valid pairs within the date windows."""
+    today = today or date.today()
+    departures, returns = date_pairs(
+        np.datetime64(departure_date, "D"),
+        np.datetime64(return_date, "D"),
+        width=width,
+        departure_weekdays=departure_weekdays,
+        return_weekdays=return_weekdays,
+        min_stay=min_stay,
+        max_stay=max_stay,
+        earliest=np.datetime64(today, "D"),
+    )
+    pairs = list(zip(format_dates(departures, "YYYY-MM-DD"), format_dates(returns, "YYYY-MM-DD")))
+    departure_days = sorted({departure for departure, _ in pairs})
+    return_days = sorted({return_day for _, return_day in pairs})
+    response: Dict[str, Any] = {
+        "route": f"{origin} -> {destination}",
+        "window": {
+            "departure": [departure_days[0], departure_days[-1]] if pairs else None,
+            "return": [return_days[0], return_days[-1]] if pairs else None,
+        },
+    }
+    if not pairs:
+        return {**response, "error": "No departure and return days in the window satisfy the constraints"}
+
+    legs: Legs = {}
+    seen: Dict[str, Set[str]] = {"outbound": set(), "inbound": set()}
+    base = (departure_date.isoformat(), return_date.isoformat())
+    # Start from the requested dates when they are a valid pair themselves
+    pair: Optional[Tuple[str, str]] = base if base in pairs else pairs[0]
+    searches = 0
+    while pair is not None and searches < max_searches:
+        result = await search(
+            provider, origin, destination, date.fromisoformat(pair[0]), date.fromisoformat(pair[1]), adults
+        )
+        searches += 1
+        if "error" in result:
+            if not legs:
+                return {**response, "searches": searches, "error": result["error"]}
+            # Keep what was collected; the solvers still work on the days seen so far
+            response["partial"] = True
+            break
+        _merge_legs(legs, result.get("legs") or {})
+        seen["outbound"].add(pair[0])
+        seen["inbound"].add(pair[1])
+        for directions in result.get("legs", {}).values():
+            seen["outbound"].update(directions.get("outbound", {}))
+            seen["inbound"].update(directions.get("inbound", {}))
+        pair = _next_pair(pairs, seen)
+
+    in_window: Legs = {
+        kind: {
+            "outbound": {day: price for day, price in directions.get("outbound", {}).items() if day in departure_days},
+            "inbound": {day: price for day, price in directions.get("inbound", {}).items() if day in return_days},
+        }
+        for kind, directions in legs.items()
+    }
+    return {
+        **response,
+        "searches": searches,
+        "best_by_stay": {
+            kind: [trip._asdict() for trip in best_by_stay(directions["outbound"], directions["inbound"], min_stay, max_stay)]
+            for kind, directions in in_window.items()
+        },
+        "cheapest": {
+            kind: [
+                trip._asdict()
+                for trip in cheapest_round_trips(directions["outbound"], directions["inbound"], top_k, min_stay, max_stay)
+            ]
+            for kind, directions in in_window.items()
+        },
+        "legs": in_window,
+    }
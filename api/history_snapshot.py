@@ -0,0 +1,194 @@
+"""
+Columnar in-memory snapshot of ``historical_fares``.
+
+The table is read once into one NumPy array per column, with rows sorted by
+route so every (origin, destination) pair is a contiguous slice found through
+a dict index. Numeric columns are float64 with NaN for NULL; text columns are
+object arrays. ``/history`` lookups and aggregates are served from the
+snapshot without touching SQLite.
+
+A snapshot is immutable. ``SnapshotStore`` watches the database file and
+builds a replacement in a worker thread when it changes, then swaps the
+reference in one assignment, so readers never wait for a rebuild. Tables
+derived from the history register with ``on_reload`` and are rebuilt in that
+same worker thread, after the swap.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .conditional import database_version
+except ImportError:  # pragma: no cover
+    from api.conditional import database_version
+
+RouteKey = Tuple[str, str]
+
+NUMERIC_TYPES = ("INT", "REAL", "FLOA", "DOUB", "NUM")
+
+
+class HistorySnapshot:
+    def __init__(
+        self,
+        version: str,
+        columns: Dict[str, np.ndarray],
+        integer_columns: frozenset,
+        index: Dict[RouteKey, Tuple[int, int]],
+    ):
+        self.version = version
+        self.columns = columns
+        self._integer_columns = integer_columns
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self.columns["id"]) if "id" in self.columns else 0
+
+    @classmethod
+    def load(cls, db_path: Path) -> "HistorySnapshot":
+        version = database_version(db_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            table_info = conn.execute("PRAGMA table_info(historical_fares)").fetchall()
+            names = [row[1] for row in table_info]
+            numeric = {row[1] for row in table_info if row[2].upper().startswith(NUMERIC_TYPES)}
+            integer = frozenset(row[1] for row in table_info if row[2].upper().startswith("INT"))
+            rows = conn.execute(
+                "SELECT * FROM historical_fares ORDER BY UPPER(origin), UPPER(destination), id"
+            ).fetchall() if names else []
+        finally:
+            conn.close()
+
+        columns: Dict[str, np.ndarray] = {}
+        for position, name in enumerate(names):
+            values = [row[position] for row in rows]
+            if name in numeric:
+                columns[name] = np.array(
+                    [math.nan if value is None else value for value in values], dtype=np.float64
+                )
+            else:
+                columns[name] = np.array(values, dtype=object)
+
+        index: Dict[RouteKey, Tuple[int, int]] = {}
+        if rows:
+            origins = columns["origin"]
+            destinations = columns["destination"]
+            start = 0
+            for position in range(1, len(rows) + 1):
+                if position == len(rows) or (
+                    origins[position].upper() != origins[start].upper()
+                    or destinations[position].upper() != destinations[start].upper()
+                ):
+                    index[(origins[start].upper(), destinations[start].upper())] = (start, position)
+                    start = position
+        return cls(version, columns, integer, index)
+
+    def route_rows(self, origin: str, destination: str) -> Optional[slice]:
+        bounds = self._index.get((origin.upper(), destination.upper()))
+        return slice(*bounds) if bounds else None
+
+    def row(self, position: int) -> Dict[str, Any]:
+        """One row as a dict, with NULLs back to None and integer columns back to int."""
+        record: Dict[str, Any] = {}
+        for name, column in self.columns.items():
+            value = column[position]
+            if isinstance(value, np.floating):
+                value = None if math.isnan(value) else (int(value) if name in self._integer_columns else float(value))
+            record[name] = value
+        return record
+
+    def best(self, origin: str, destination: str, column: str) -> Optional[Dict[str, Any]]:
+        """Row with the lowest non-NULL ``column`` for the route (first one on ties)."""
+        rows = self.route_rows(origin, destination)
+        if rows is None or self.columns.get(column, np.empty(0)).dtype != np.float64:
+            return None
+        values = self.columns[column][rows]
+        if values.size == 0 or np.isnan(values).all():
+            return None
+        return self.row(rows.start + int(np.nanargmin(values)))
+
+    def stats(self, origin: str, destination: str, column: str) -> Optional[Dict[str, Any]]:
+        """Count, min, mean and median of the non-NULL ``column`` values of the route."""
+        rows = self.route_rows(origin, destination)
+        if rows is None or self.columns.get(column, np.empty(0)).dtype != np.float64:
+            return None
+        values = self.columns[column][rows]
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return None
+        return {
+            "count": int(values.size),
+            "min": float(values.min()),
+            "mean": round(float(values.mean()), 2),
+            "median": float(np.median(values)),
+        }
+
+
+class SnapshotStore:
+    def __init__(self, db_path: Path, poll_interval: float = 5.0):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self._snapshot: Optional[HistorySnapshot] = None
+        self._listeners: List[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def current(self) -> HistorySnapshot:
+        """The live snapshot; loaded synchronously only if nothing was loaded yet."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = HistorySnapshot.load(self.db_path)
+        return snapshot
+
+    def on_reload(self, listener: Callable[[], None]) -> None:
+        """Call ``listener`` (from the reloading thread) every time a new snapshot is swapped in."""
+        self._listeners.append(listener)
+
+    def refresh(self) -> bool:
+        """Rebuild and swap in a new snapshot when the database changed; returns True when swapped."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == database_version(self.db_path):
+            return False
+        start = time.perf_counter()
+        replacement = HistorySnapshot.load(self.db_path)
+        self._snapshot = replacement
+        print(
+            f"Loaded history snapshot {replacement.version} "
+            f"({len(replacement)} rows) in {time.perf_counter() - start:.3f}s"
+        )
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as exc:
+                # The other derived tables still get rebuilt
+                print(f"Rebuilding {getattr(listener, '__qualname__', listener)} failed: {exc}")
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as exc:
+                # Keep serving the previous snapshot
+                print(f"History snapshot reload failed: {exc}")
@@ -1,16 +1,18 @@
 from __future__ import annotations
 
 import asyncio
-import math
-import sqlite3
+import json
+import os
 import sys
 import unicodedata
-from datetime import date, datetime, timezone
+from contextlib import asynccontextmanager
+from datetime import date, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Mapping, Optional, Sequence, Tuple
 
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 # Make sure repository-level packages resolve when running from api/
@@ -20,52 +22,185 @@ if str(REPO_ROOT) not in sys.path:
 
 try:
     from .cities import CIDADES, CITY_ALIASES
+    from . import metrics, timing
+    from .batch import BatchQuery, BatchSearchRequest, run_batch
+    from .browser_pool import BrowserPool
+    from .cache import LegCache, NegativeCache, ResultCache
+    from .compression import CompressionMiddleware
+    from .conditional import CITIES_VERSION, not_modified, strong_etag
+    from .history_snapshot import SnapshotStore
+    from .flexible import flexible_search
+    from .fare_store import FareStore, PersistentResultCache
+    from .raw_archive import RawArchive
+    from .engine import SearchEngine, record_error, timed_phase
+    from .providers import AzulCashProvider, AzulMilesProvider, SmilesProvider
+    from .route_graph import RouteGraph
+    from .rate_limit import AdaptiveTokenBucket, IntervalLimiter, RequestBudget
+    from .session_store import SessionStore
+    from .validation import route_error, search_error
+    from .valuation import ValuationTable
+    from . import watchlist
 except ImportError:  # pragma: no cover
     from api.cities import CIDADES, CITY_ALIASES
-from azul_scraper.azul_scraper_api_miles import (
-    FlightSearchMiles,
-    extract_flight_info as extract_azul_miles_info,
-)
-from azul_scraper.azul_scraper_api_money import (
-    FlightSearchMoney,
-    extract_flight_info as extract_azul_money_info,
-)
-from smiles_scraper.smiles_scraper_interceptor import (
-    SmilesFlightSearch,
-    extract_flight_info as extract_smiles_info,
-)
-
+    from api import metrics, timing
+    from api.batch import BatchQuery, BatchSearchRequest, run_batch
+    from api.browser_pool import BrowserPool
+    from api.cache import LegCache, NegativeCache, ResultCache
+    from api.compression import CompressionMiddleware
+    from api.conditional import CITIES_VERSION, not_modified, strong_etag
+    from api.history_snapshot import SnapshotStore
+    from api.flexible import flexible_search
+    from api.fare_store import FareStore, PersistentResultCache
+    from api.raw_archive import RawArchive
+    from api.engine import SearchEngine, record_error, timed_phase
+    from api.providers import AzulCashProvider, AzulMilesProvider, SmilesProvider
+    from api.route_graph import RouteGraph
+    from api.rate_limit import AdaptiveTokenBucket, IntervalLimiter, RequestBudget
+    from api.session_store import SessionStore
+    from api.validation import route_error, search_error
+    from api.valuation import ValuationTable
+    from api import watchlist
+
+# TCC_API_MODE=history serves /history, /cities, /watchlist and /metrics only: the search
+# routes are not mounted, so the scraping stack (imported lazily by the providers) never loads
+API_MODE = os.getenv("TCC_API_MODE", "full").lower()
+SEARCH_ENABLED = API_MODE != "history"
+
+# Cost of a mile (R$) when the history has no data for the program
 DEFAULT_PRICE_PER_MILE = 0.02
 SQLITE_PATH = REPO_ROOT / "local" / "tcc_history.sqlite"
+HISTORY_ENDPOINT = "/history"
 
-smiles_search = SmilesFlightSearch()
-azul_miles_search = FlightSearchMiles()
-azul_cash_search = FlightSearchMoney()
+# historical_fares served from memory, reloaded in the background when the file changes
+history_store = SnapshotStore(SQLITE_PATH)
 
-smiles_lock = asyncio.Lock()
-azul_miles_lock = asyncio.Lock()
-azul_cash_lock = asyncio.Lock()
+# /history must be revalidated (cheap thanks to the ETag); the city list may be reused for a day
+HISTORY_CACHE_CONTROL = "no-cache"
+CITIES_CACHE_CONTROL = "public, max-age=86400"
 
+# (connect, read) timeouts in seconds for each provider's upstream HTTP call
+PROVIDER_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "smiles": (5.0, 20.0),
+    "azul_miles": (5.0, 20.0),
+    "azul_cash": (5.0, 20.0),
+}
 
-def _finite_or_none(value: Optional[float]) -> Optional[float]:
-    """Return a finite float value or None when missing/invalid."""
-    if value is None:
-        return None
-    if isinstance(value, (int, float)):
-        float_value = float(value)
-        return float_value if math.isfinite(float_value) else None
-    return None
+# Warm headless Chrome instances reused by every session capture (launched on first capture)
+browser_pool = BrowserPool(size=1, max_contexts=2, headless=True)
+
+# Captured sessions shared by every worker process (uvicorn --workers N); TCC_SESSION_STORE=off disables it
+SESSION_STORE_SETTING = os.getenv("TCC_SESSION_STORE", str(REPO_ROOT / "local" / "sessions.sqlite"))
+session_store = (
+    None if SESSION_STORE_SETTING.lower() in {"", "0", "off", "false", "no"} else SessionStore(Path(SESSION_STORE_SETTING))
+)
 
+# Upstream request rate per provider, shared by every worker and lowered on 429s/challenges/slow
+# responses; TCC_RATE_LIMIT_STORE=off disables it
+RATE_LIMIT_STORE_SETTING = os.getenv("TCC_RATE_LIMIT_STORE", str(REPO_ROOT / "local" / "rate_limits.sqlite"))
+upstream_limiters: Dict[str, AdaptiveTokenBucket] = (
+    {}
+    if RATE_LIMIT_STORE_SETTING.lower() in {"", "0", "off", "false", "no"}
+    else {
+        name: AdaptiveTokenBucket(Path(RATE_LIMIT_STORE_SETTING), name)
+        for name in ("smiles", "azul_miles", "azul_cash")
+    }
+)
+
+# Last good result per provider query, served while a provider cannot be queried and by swr.
+# Persisted in SQLite (shared by the workers, kept across restarts) unless TCC_FARE_CACHE=off
+FARE_CACHE_SETTING = os.getenv("TCC_FARE_CACHE", str(REPO_ROOT / "local" / "fare_cache.sqlite"))
+result_cache: ResultCache = (
+    ResultCache()
+    if FARE_CACHE_SETTING.lower() in {"", "0", "off", "false", "no"}
+    else PersistentResultCache(FareStore(Path(FARE_CACHE_SETTING), ttl=86400.0, max_entries=20000))
+)
+
+# Raw upstream responses, zstd-compressed and deduplicated by content hash, for later analysis.
+# Opt-in: TCC_RAW_ARCHIVE=on archives to local/raw_archive.sqlite, any other value is the file path
+RAW_ARCHIVE_SETTING = os.getenv("TCC_RAW_ARCHIVE", "off")
+raw_archive: Optional[RawArchive] = None
+if RAW_ARCHIVE_SETTING.lower() not in {"", "0", "off", "false", "no"}:
+    archive_path = (
+        REPO_ROOT / "local" / "raw_archive.sqlite"
+        if RAW_ARCHIVE_SETTING.lower() in {"1", "on", "true", "yes"}
+        else Path(RAW_ARCHIVE_SETTING)
+    )
+    try:
+        raw_archive = RawArchive(archive_path)
+    except RuntimeError as exc:
+        print(f"Raw response archive disabled: {exc}")
+
+# Stale-while-revalidate for /search?swr=true: results younger than the fresh TTL are served as is,
+# results up to the stale limit are served flagged stale while one background search refreshes them
+SEARCH_FRESH_TTL = 300.0
+SEARCH_STALE_LIMIT = 3600.0
+
+# Leg prices stay fresh as long as results do; round trips made of two fresh legs skip the provider
+LEG_CACHE_TTL = SEARCH_FRESH_TTL
+leg_cache = LegCache(ttl=LEG_CACHE_TTL)
+
+# Failed queries are not retried upstream for a minute, and dates without flights for five
+negative_cache = NegativeCache(error_ttl=60.0, empty_ttl=300.0)
+
+# Providers selling each loyalty program of the history, and (for rows without a program) each airline
+ROUTE_PROGRAM_PROVIDERS: Dict[str, Tuple[str, ...]] = {
+    "Smiles": ("smiles",),
+    "Azul": ("azul_miles", "azul_cash"),
+}
+ROUTE_AIRLINE_PROVIDERS: Dict[str, Tuple[str, ...]] = {
+    "Gol": ("smiles",),
+    "Azul": ("azul_miles", "azul_cash"),
+}
+# Rebuilt in the background whenever the history snapshot changes version; searches only read it
+route_graph = RouteGraph(
+    SQLITE_PATH,
+    ROUTE_PROGRAM_PROVIDERS,
+    ROUTE_AIRLINE_PROVIDERS,
+    version=lambda: history_store.current.version,
+)
+history_store.on_reload(route_graph.refresh)
+
+# Every provider search runs through the engine (locks, breakers, session refresh, cache, metrics).
+# Each provider imports and builds its scraper on its first search.
+engine = SearchEngine(
+    [
+        SmilesProvider(timeout=PROVIDER_TIMEOUTS["smiles"], browser_pool=browser_pool, headless=True),
+        AzulMilesProvider(timeout=PROVIDER_TIMEOUTS["azul_miles"], browser_pool=browser_pool),
+        AzulCashProvider(timeout=PROVIDER_TIMEOUTS["azul_cash"], browser_pool=browser_pool),
+    ],
+    result_cache,
+    session_store=session_store,
+    limiters=upstream_limiters,
+    leg_cache=leg_cache,
+    negative_cache=negative_cache,
+    route_graph=route_graph,
+    archive=raw_archive,
+)
 
-def _sum_optional(values: Iterable[Optional[float]]) -> Optional[float]:
-    """Sum optional numeric values, returning None when all inputs are missing."""
-    total = 0.0
-    has_value = False
-    for value in values:
-        if value is not None:
-            total += float(value)
-            has_value = True
-    return total if has_value else None
+# Minimum spacing (seconds) between batch calls to each provider
+BATCH_MIN_INTERVAL: Dict[str, float] = {
+    "smiles": 1.0,
+    "azul_miles": 1.0,
+    "azul_cash": 1.0,
+}
+batch_limiters: Dict[str, IntervalLimiter] = {
+    name: IntervalLimiter(interval) for name, interval in BATCH_MIN_INTERVAL.items()
+}
+
+# Flexible-date searches: widest window (days on each side) and most provider searches per query
+FLEXIBLE_MAX_WIDTH = 7
+FLEXIBLE_MAX_SEARCHES = 8
+
+# Background watchlist crawler (opt-in, needs the search routes) and its hourly request budget per provider
+WATCHLIST_CRAWLER_ENABLED = SEARCH_ENABLED and os.getenv("TCC_WATCHLIST_CRAWLER", "0").lower() in {"1", "true", "yes"}
+# Watchlist entries and crawled fares live apart from the history database, so crawling never
+# changes its version (and with it the /history ETags, snapshot and derived tables)
+WATCHLIST_DB_PATH = Path(os.getenv("TCC_WATCHLIST_DB", str(REPO_ROOT / "local" / "watchlist.sqlite")))
+WATCHLIST_BUDGET_PER_HOUR: Dict[str, int] = {
+    "smiles": 30,
+    "azul_miles": 30,
+    "azul_cash": 30,
+}
 
 
 def _resolve_city(name: Optional[str]) -> Optional[str]:
@@ -84,7 +219,7 @@ def _resolve_city(name: Optional[str]) -> Optional[str]:
     return cleaned
 
 
-def _format_historical_payload(origin_code: str, destination_code: str, row: sqlite3.Row) -> Dict[str, Any]:
+def _format_historical_payload(origin_code: str, destination_code: str, row: Mapping[str, Any]) -> Dict[str, Any]:
     """Normalize a historical row to match the scraper JSON contract."""
     record = dict(row)
     return {
@@ -108,249 +243,365 @@ def _format_historical_payload(origin_code: str, destination_code: str, row: sql
     }
 
 
-app = FastAPI(title="TCC API")
+async def _watchlist_runner(
+    provider: str, origin: str, destination: str, departure_date: date, return_date: date, admit: Callable[[], bool]
+) -> Dict[str, Any]:
+    return await engine.search(provider, origin, destination, departure_date, return_date, admit=admit)
+
+
+# Loyalty program of each miles provider and the provider quoting the same trip in cash
+VALUATION_PROGRAMS: Dict[str, Tuple[str, str]] = {
+    "smiles": ("Smiles", "smiles"),
+    "azul_miles": ("Azul", "azul_cash"),
+}
+valuation_table = ValuationTable(
+    SQLITE_PATH,
+    DEFAULT_PRICE_PER_MILE,
+    _resolve_city,
+    version=lambda: history_store.current.version,
+)
+history_store.on_reload(valuation_table.refresh)
+
+
+watchlist_crawler = watchlist.WatchlistCrawler(
+    WATCHLIST_DB_PATH,
+    SQLITE_PATH,
+    _watchlist_runner,
+    _resolve_city,
+    providers=list(WATCHLIST_BUDGET_PER_HOUR),
+    budgets={name: RequestBudget(limit, 3600.0) for name, limit in WATCHLIST_BUDGET_PER_HOUR.items()},
+    history_version=lambda: history_store.current.version,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await asyncio.to_thread(history_store.refresh)
+    history_store.start()
+    await asyncio.to_thread(valuation_table.refresh)
+    await asyncio.to_thread(route_graph.refresh)
+    await asyncio.to_thread(watchlist.init_db, WATCHLIST_DB_PATH)
+    if WATCHLIST_CRAWLER_ENABLED:
+        watchlist_crawler.start()
+    yield
+    await watchlist_crawler.stop()
+    await history_store.stop()
+    await browser_pool.close()
+
+
+app = FastAPI(title="TCC API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+# Provider searches; mounted unless the API runs in history-only mode
+search_router = APIRouter()
 
-async def _search_smiles_flight(origin: str, destination: str, departure_date: date, return_date: date, adults: int = 1):
+
+@app.middleware("http")
+async def server_timing_header(request: Request, call_next):
+    """Attach the per-phase breakdown recorded during the request as Server-Timing."""
+    if not timing.ENABLED:
+        return await call_next(request)
+    recorder, token = timing.begin()
+    try:
+        response = await call_next(request)
+    finally:
+        timing.end(token)
+    header = recorder.header()
+    if header:
+        response.headers["Server-Timing"] = header
+        response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
+
+def _render_result(result: Dict[str, Any], detail: str) -> Dict[str, Any]:
+    """
+    Shape a provider result for the response.
+    "summary" drops the per-flight records and per-day leg prices; "full" keeps
+    the leg prices and expands the flights into objects.
     """
-    Perform a search for a Smiles flight given the input parameters.
+    flights = result.get("flights")
+    if flights is None:
+        return result
+    rendered = {name: value for name, value in result.items() if name not in ("flights", "legs")}
+    if detail == "full":
+        rendered["legs"] = result.get("legs", {})
+        # Results read back from the fare cache already hold plain objects
+        rendered["flights"] = {
+            direction: [
+                record
+                if isinstance(record, dict)
+                else {**record._asdict(), "fares": [fare._asdict() for fare in record.fares]}
+                for record in records
+            ]
+            for direction, records in flights.items()
+        }
+    return rendered
+
+
+def _annotate_valuation(response: Dict[str, Any], origin: str, destination: str) -> None:
+    """Attach the miles-vs-cash valuation to every miles result that has a total."""
+    for provider, (program, cash_provider) in VALUATION_PROGRAMS.items():
+        result = response.get(provider)
+        if not result or "error" in result:
+            continue
+        miles = (result.get("total") or {}).get("miles")
+        if miles is None:
+            continue
+        cash_result = response.get(cash_provider) or {}
+        cash = None if "error" in cash_result else (cash_result.get("total") or {}).get("money")
+        response[provider] = {
+            **result,
+            "valuation": valuation_table.appraise(origin, destination, program, miles, cash),
+        }
+
+
+@search_router.get("/search")
+async def search_flight(
+    origin: str,
+    destination: str,
+    departure_date: date,
+    return_date: date,
+    adults: int = 1,
+    detail: Literal["summary", "full"] = "summary",
+    swr: bool = False,
+):
+    """
+    Perform a search for a flight given the input parameters.
     Returns a JSON result standardized to match the structure of the Azul cash/miles search.
+    With detail=full every provider also lists its flights and their fares.
+    Miles results carry their cash equivalent and whether miles or cash is the better buy.
+    Unknown airports, same-city routes and past or inverted dates are rejected with 422.
+    Providers known to fly the route are queried first; those known not to are skipped.
+    With swr=true a cached result up to an hour old is returned immediately with its
+    age_seconds (flagged stale past five minutes) and refreshed in the background.
     """
-    dep_str = departure_date.strftime("%Y-%m-%d")
-    ret_str = return_date.strftime("%Y-%m-%d")
+    invalid = search_error(origin, destination, departure_date, return_date, adults)
+    if invalid is not None:
+        raise HTTPException(status_code=422, detail=invalid)
+    response: Dict[str, Any] = {}
+    for provider in engine.for_route(origin, destination):
+        result = await engine.search(
+            provider,
+            origin,
+            destination,
+            departure_date,
+            return_date,
+            adults,
+            fresh_ttl=SEARCH_FRESH_TTL if swr else None,
+            stale_ttl=SEARCH_STALE_LIMIT if swr else None,
+        )
+        response[provider] = _render_result(result, detail)
+    _annotate_valuation(response, origin, destination)
+    response["circuit_breakers"] = engine.breaker_snapshots()
+    return response
 
-    dep_dt = datetime.strptime(dep_str, "%Y-%m-%d")
-    ret_dt = datetime.strptime(ret_str, "%Y-%m-%d")
-    dep_ts = int(dep_dt.timestamp() * 1000)
-    ret_ts = int(ret_dt.timestamp() * 1000)
 
-    async with smiles_lock:
-        await smiles_search.initialize_headers(
-            origin, destination, dep_ts, ret_ts
+@search_router.post("/search/batch")
+async def search_flight_batch(batch: BatchSearchRequest) -> StreamingResponse:
+    """
+    Search many (origin, destination, dates) queries at once.
+    Duplicated queries are searched once; results stream back as NDJSON lines,
+    one per unique query, as soon as every provider has answered it.
+    """
+    providers = batch.providers or list(engine)
+    if not providers:
+        raise HTTPException(status_code=422, detail="No providers selected")
+    unknown = [name for name in providers if name not in engine]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown providers: {unknown}")
+
+    async def _run(provider: str, query: BatchQuery) -> Dict[str, Any]:
+        result = await engine.search(
+            provider,
+            query.origin,
+            query.destination,
+            query.departure_date,
+            query.return_date,
+            query.adults,
         )
-        flight_data = await asyncio.to_thread(
-            smiles_search.get_flight_info,
+        return _render_result(result, "summary")
+
+    async def _lines() -> AsyncIterator[str]:
+        async for result in run_batch(batch.queries, providers, _run, batch_limiters):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
+@search_router.get("/search/flexible")
+async def search_flexible_dates(
+    origin: str,
+    destination: str,
+    departure_date: date,
+    return_date: date,
+    adults: int = 1,
+    width: int = 3,
+    min_stay: int = 0,
+    max_stay: Optional[int] = None,
+    departure_weekdays: Optional[List[int]] = Query(None),
+    return_weekdays: Optional[List[int]] = Query(None),
+    top_k: int = 5,
+):
+    """
+    Cheapest round trips with departure and return within +/- width days of the given dates,
+    optionally only on the given weekdays (Monday = 0, repeat the parameter for several).
+    Leg prices are collected per day with as few provider searches as possible and then
+    paired: "best_by_stay" has the cheapest trip for each stay length (in days) and
+    "cheapest" the top_k cheapest trips whose stay is between min_stay and max_stay.
+    """
+    if not 0 <= width <= FLEXIBLE_MAX_WIDTH:
+        raise HTTPException(status_code=422, detail=f"width must be between 0 and {FLEXIBLE_MAX_WIDTH}")
+    if min_stay < 0 or (max_stay is not None and max_stay < min_stay):
+        raise HTTPException(status_code=422, detail="min_stay must be >= 0 and max_stay >= min_stay")
+    if any(not 0 <= day <= 6 for day in (departure_weekdays or []) + (return_weekdays or [])):
+        raise HTTPException(status_code=422, detail="Weekdays must be between 0 (Monday) and 6 (Sunday)")
+    if not 1 <= top_k <= 50:
+        raise HTTPException(status_code=422, detail="top_k must be between 1 and 50")
+    # The window may reach into the past; flexible_search drops those days itself
+    invalid = route_error(origin, destination) or (
+        "Return date must not be before the departure date" if return_date < departure_date else None
+    )
+    if invalid is not None:
+        raise HTTPException(status_code=422, detail=invalid)
+
+    response: Dict[str, Any] = {}
+    for provider in engine.for_route(origin, destination):
+        response[provider] = await flexible_search(
+            engine.search,
+            provider,
             origin,
             destination,
-            dep_str,
-            ret_str,
+            departure_date,
+            return_date,
+            adults,
+            width=width,
+            min_stay=min_stay,
+            max_stay=max_stay,
+            departure_weekdays=departure_weekdays,
+            return_weekdays=return_weekdays,
+            top_k=top_k,
+            max_searches=FLEXIBLE_MAX_SEARCHES,
         )
+    response["circuit_breakers"] = engine.breaker_snapshots()
+    return response
 
-    if "error" in flight_data:
-        return {
-            "route": f"{origin} -> {destination}",
-            "departure": dep_str,
-            "return": ret_str,
-            "error": flight_data["error"],
-        }
-    flight_info = extract_smiles_info(flight_data)
-    if "error" in flight_info:
-        return {
-            "route": f"{origin} -> {destination}",
-            "departure": dep_str,
-            "return": ret_str,
-            "error": flight_info["error"],
-        }
-    outbound_miles = _finite_or_none(flight_info.get("lowest_outbound_miles"))
-    outbound_money = _finite_or_none(flight_info.get("lowest_outbound_money"))
-    inbound_miles = _finite_or_none(flight_info.get("lowest_inbound_miles"))
-    inbound_money = _finite_or_none(flight_info.get("lowest_inbound_money"))
 
-    total_miles = _sum_optional([outbound_miles, inbound_miles])
-    total_money = _sum_optional([outbound_money, inbound_money])
-
-    # Standardize JSON to match Azul cash/miles search
-    json_result = {
-        "route": f"{origin} -> {destination}",
-        "departure": dep_str,
-        "return": ret_str,
-        "outbound": {
-            "miles": outbound_miles,
-            "money": outbound_money,
-        },
-        "inbound": {
-            "miles": inbound_miles,
-            "money": inbound_money,
-        },
-        "total": {
-            "miles": total_miles,
-            "money": total_money,
-        },
-    }
-    return json_result
+if SEARCH_ENABLED:
+    app.include_router(search_router)
 
 
-async def search_azul_miles_flight(origin: str, destination: str, departure_date: date, return_date: date, adults: int = 1):
+@app.get("/history")
+async def search_historical_flight(origin: str, destination: str, request: Request, response: Response):
     """
-    Perform a search for an Azul miles flight given the input parameters.
-    Returns a JSON result mirroring the CLI/debug output structure from azul_scraper_api_miles.py.
+    Retrieve the lowest historical fare registered for the informed route.
+    Served from the in-memory snapshot of the table, with a strong ETag tied to
+    the snapshot's database version; a matching If-None-Match is answered with 304.
     """
-    dep_str = departure_date.strftime("%m/%d/%Y")
-    ret_str = return_date.strftime("%m/%d/%Y")
-
-    async with azul_miles_lock:
-        flight_data = await azul_miles_search.get_flight_info(
-            origin, destination, dep_str, ret_str
-        )
-
-    if "error" in flight_data:
-        return {
-            "route": f"{origin} -> {destination}",
-            "departure": dep_str,
-            "return": ret_str,
-            "error": flight_data["error"],
-        }
+    origin_name = _resolve_city(origin)
+    destination_name = _resolve_city(destination)
+    if not origin_name or not destination_name:
+        record_error("snapshot", "unknown_route", endpoint=HISTORY_ENDPOINT)
+        return {"error": f"Unknown route identifiers: origin={origin!r}, destination={destination!r}"}
 
-    flight_info = extract_azul_miles_info(flight_data)
-    if "error" in flight_info:
-        return {
-            "route": f"{origin} -> {destination}",
-            "departure": dep_str,
-            "return": ret_str,
-            "error": flight_info["error"],
+    snapshot = history_store.current
+    etag = strong_etag("history", snapshot.version, CITIES_VERSION)
+    cached = not_modified(request, etag, HISTORY_CACHE_CONTROL)
+    if cached is not None:
+        return cached
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = HISTORY_CACHE_CONTROL
+
+    # Menor valor histórico para o par (origin, destination), servido do snapshot em memória.
+    with timed_phase("snapshot", "lookup", metrics.HISTORY_QUERY_SECONDS, endpoint=HISTORY_ENDPOINT):
+        miles_row = snapshot.best(origin_name, destination_name, "total_miles")
+        cash_row = snapshot.best(origin_name, destination_name, "total_cash")
+        stats = {
+            "miles": snapshot.stats(origin_name, destination_name, "total_miles"),
+            "money": snapshot.stats(origin_name, destination_name, "total_cash"),
         }
 
-    outbound_miles = _finite_or_none(flight_info.get("lowest_outbound"))
-    inbound_miles = _finite_or_none(flight_info.get("lowest_inbound"))
-    total_miles = _sum_optional([outbound_miles, inbound_miles])
+    if not miles_row and not cash_row:
+        record_error("snapshot", "not_found", endpoint=HISTORY_ENDPOINT)
+        return {"error": f"No historical data found for route {origin_name} -> {destination_name}"}
 
-    json_result = {
+    payload: Dict[str, Any] = {
         "route": f"{origin} -> {destination}",
-        "departure": dep_str,
-        "return": ret_str,
-        "outbound": {
-            "miles": outbound_miles,
-        },
-        "inbound": {
-            "miles": inbound_miles,
-        },
-        "total": {
-            "miles": total_miles,
-        },
+        "origin_name": origin_name,
+        "destination_name": destination_name,
+        "best_miles": _format_historical_payload(origin, destination, miles_row) if miles_row else None,
+        "best_money": _format_historical_payload(origin, destination, cash_row) if cash_row else None,
+        "stats": stats,
     }
-    return json_result
+    return payload
 
 
-async def search_azul_cash_flight(origin: str, destination: str, departure_date: date, return_date: date, adults: int = 1):
+@app.get("/cities")
+async def list_cities(request: Request, response: Response):
     """
-    Perform a search for an Azul cash flight given the input parameters.
-    Returns a JSON result mirroring the CLI/debug output structure from azul_scraper_api_money.py.
+    IATA code to city name table and the accepted city aliases.
     """
-    dep_str = departure_date.strftime("%m/%d/%Y")
-    ret_str = return_date.strftime("%m/%d/%Y")
+    etag = strong_etag("cities", CITIES_VERSION)
+    cached = not_modified(request, etag, CITIES_CACHE_CONTROL)
+    if cached is not None:
+        return cached
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CITIES_CACHE_CONTROL
+    return {"cities": CIDADES, "aliases": CITY_ALIASES}
 
-    async with azul_cash_lock:
-        flight_data = await azul_cash_search.get_flight_info(
-            origin, destination, dep_str, ret_str
-        )
 
-    if "error" in flight_data:
-        return {
-            "route": f"{origin} -> {destination}",
-            "departure": dep_str,
-            "return": ret_str,
-            "error": flight_data["error"],
-        }
+@app.get("/watchlist")
+async def get_watchlist():
+    """
+    List the active watchlist entries.
+    """
+    return {"entries": await asyncio.to_thread(watchlist.list_entries, WATCHLIST_DB_PATH), "crawler_enabled": WATCHLIST_CRAWLER_ENABLED}
 
-    flight_info = extract_azul_money_info(flight_data)
-    if "error" in flight_info:
-        return {
-            "route": f"{origin} -> {destination}",
-            "departure": dep_str,
-            "return": ret_str,
-            "error": flight_info["error"],
-        }
 
-    outbound_money = _finite_or_none(flight_info.get("lowest_outbound"))
-    inbound_money = _finite_or_none(flight_info.get("lowest_inbound"))
-    total_money = _sum_optional([outbound_money, inbound_money])
+@app.post("/watchlist")
+async def add_watchlist_entry(entry: watchlist.WatchEntry):
+    """
+    Add a route and departure window to the watchlist crawled in the background.
+    """
+    if entry.departure_to < entry.departure_from:
+        raise HTTPException(status_code=422, detail="departure_to must not be before departure_from")
+    invalid = route_error(entry.origin, entry.destination)
+    if invalid is not None:
+        raise HTTPException(status_code=422, detail=invalid)
+    return {"id": await asyncio.to_thread(watchlist.add_entry, WATCHLIST_DB_PATH, entry)}
 
-    json_result = {
-        "route": f"{origin} -> {destination}",
-        "departure": dep_str,
-        "return": ret_str,
-        "outbound": {
-            "money": outbound_money,
-        },
-        "inbound": {
-            "money": inbound_money,
-        },
-        "total": {
-            "money": total_money,
-        },
-    }
-    return json_result
+
+@app.delete("/watchlist/{entry_id}")
+async def remove_watchlist_entry(entry_id: int):
+    """
+    Stop crawling a watchlist entry.
+    """
+    if not await asyncio.to_thread(watchlist.deactivate_entry, WATCHLIST_DB_PATH, entry_id):
+        raise HTTPException(status_code=404, detail=f"Watchlist entry {entry_id} not found")
+    return {"id": entry_id, "active": False}
 
 
-@app.get("/search")
-async def search_flight(origin: str, destination: str, departure_date: date, return_date: date, adults: int = 1):
+@app.get("/watchlist/alerts")
+async def get_watchlist_alerts(limit: int = 50):
     """
-    Perform a search for a flight given the input parameters.
-    Returns a JSON result standardized to match the structure of the Azul cash/miles search.
+    Most recent crawled fares that beat the historical best for their route.
     """
-    return {
-        "smiles": await _search_smiles_flight(origin, destination, departure_date, return_date, adults),
-        "azul_miles": await search_azul_miles_flight(origin, destination, departure_date, return_date, adults),
-        "azul_cash": await search_azul_cash_flight(origin, destination, departure_date, return_date, adults),
-    }
+    return {"alerts": await asyncio.to_thread(watchlist.recent_alerts, WATCHLIST_DB_PATH, limit)}
 
 
-@app.get("/history")
-async def search_historical_flight(origin: str, destination: str):
+@app.get("/metrics")
+async def prometheus_metrics() -> Response:
     """
-    Retrieve the lowest historical fare registered for the informed route.
+    Expose request, provider and lock timings in the Prometheus text format.
     """
-    
-    # Busca menor valor histórico para o par (origin, destination) no banco SQLite.
-    conn = sqlite3.connect(SQLITE_PATH)
-    conn.row_factory = sqlite3.Row
-    origin_name = _resolve_city(origin)
-    destination_name = _resolve_city(destination)
-    if not origin_name or not destination_name:
-        return {"error": f"Unknown route identifiers: origin={origin!r}, destination={destination!r}"}
-    try:
-        cursor = conn.cursor()
-
-        def _fetch_best(column: str) -> Optional[sqlite3.Row]:
-            if column not in {"total_miles", "total_cash"}:
-                return None
-            cursor.execute(
-                f"""
-                SELECT *
-                FROM historical_fares
-                WHERE 
-                    UPPER(origin) = UPPER(?) AND 
-                    UPPER(destination) = UPPER(?) AND
-                    {column} IS NOT NULL
-                ORDER BY {column} ASC
-                LIMIT 1
-                """,
-                (origin_name, destination_name),
-            )
-            return cursor.fetchone()
-
-        miles_row = _fetch_best("total_miles")
-        cash_row = _fetch_best("total_cash")
-
-        if not miles_row and not cash_row:
-            return {"error": f"No historical data found for route {origin_name} -> {destination_name}"}
-
-        response: Dict[str, Any] = {
-            "route": f"{origin} -> {destination}",
-            "origin_name": origin_name,
-            "destination_name": destination_name,
-            "best_miles": _format_historical_payload(origin, destination, miles_row) if miles_row else None,
-            "best_money": _format_historical_payload(origin, destination, cash_row) if cash_row else None,
-        }
-        return response
-    finally:
-        conn.close()
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,231 @@
+"""
+Minimal Prometheus metrics registry used by the TCC API.
+
+Only the pieces the API needs are implemented (labelled counters and
+histograms rendered in the text exposition format), so the project does not
+depend on prometheus_client.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket boundaries in seconds: sub-millisecond parsing up to 1+ minute captures.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall-clock duration of the wrapped block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines: List[str] = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(count)}"
+                )
+            inf = 'le="+Inf"'
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} {_format_value(state[-1])}"
+            )
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+PROVIDER_LABELS = ("provider", "endpoint")
+
+PROVIDER_HTTP_SECONDS = REGISTRY.register(
+    Histogram(
+        "tcc_provider_http_seconds",
+        "Duration of upstream provider HTTP calls.",
+        PROVIDER_LABELS,
+    )
+)
+LOCK_WAIT_SECONDS = REGISTRY.register(
+    Histogram(
+        "tcc_provider_lock_wait_seconds",
+        "Time spent waiting for the provider lock before a search runs.",
+        PROVIDER_LABELS,
+    )
+)
+SESSION_CAPTURE_SECONDS = REGISTRY.register(
+    Histogram(
+        "tcc_session_capture_seconds",
+        "Duration of browser session captures (the _count series is the number of captures).",
+        PROVIDER_LABELS,
+    )
+)
+EXTRACTION_SECONDS = REGISTRY.register(
+    Histogram(
+        "tcc_extraction_seconds",
+        "Time spent extracting prices from provider payloads.",
+        PROVIDER_LABELS,
+    )
+)
+HISTORY_QUERY_SECONDS = REGISTRY.register(
+    Histogram(
+        "tcc_history_query_seconds",
+        "Duration of historical fare lookups.",
+        PROVIDER_LABELS,
+    )
+)
+ERRORS = REGISTRY.register(
+    Counter(
+        "tcc_errors_total",
+        "Errors raised while serving requests, by type.",
+        PROVIDER_LABELS + ("type",),
+    )
+)
+
+CACHE_LOOKUPS = REGISTRY.register(
+    Counter(
+        "tcc_cache_lookups_total",
+        "Cache lookups made before querying a provider, by cache and result (hit/miss).",
+        PROVIDER_LABELS + ("cache", "result"),
+    )
+)
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    return REGISTRY.render()
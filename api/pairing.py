@@ -0,0 +1,116 @@
+"""
+Round-trip pairing over independently priced legs.
+
+Azul and Smiles price the outbound and inbound legs separately, so once the
+lowest price of each leg is known per day, any departure day can be paired
+with any return day without another upstream call. Two solvers work on those
+per-day leg prices:
+
+    * ``best_by_stay`` gives the cheapest pair for every stay length: the legs
+      are laid out on one day axis and each stay length is one shifted,
+      vectorized sum of the two arrays;
+    * ``cheapest_round_trips`` gives the K cheapest valid pairs overall, by
+      walking both legs sorted by price with a heap (O((n + K) log n) when the
+      stay limits reject few of the cheapest pairs).
+"""
+
+from __future__ import annotations
+
+import heapq
+from datetime import date
+from typing import List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Lowest price of one leg per day: {"YYYY-MM-DD": price}
+LegPrices = Mapping[str, float]
+
+
+class RoundTrip(NamedTuple):
+    departure: str
+    return_date: str
+    stay: int
+    outbound: float
+    inbound: float
+    total: float
+
+
+def _legs_by_ordinal(prices: LegPrices) -> List[Tuple[float, int]]:
+    return sorted((float(price), date.fromisoformat(day).toordinal()) for day, price in prices.items())
+
+
+def _round_trip(departure: int, outbound: float, return_day: int, inbound: float) -> RoundTrip:
+    return RoundTrip(
+        date.fromordinal(departure).isoformat(),
+        date.fromordinal(return_day).isoformat(),
+        return_day - departure,
+        outbound,
+        inbound,
+        outbound + inbound,
+    )
+
+
+def best_by_stay(
+    outbound: LegPrices, inbound: LegPrices, min_stay: int = 0, max_stay: Optional[int] = None
+) -> List[RoundTrip]:
+    """Cheapest round trip for every stay length (in days) that has one, shortest stay first."""
+    if not outbound or not inbound:
+        return []
+    outbound_legs = _legs_by_ordinal(outbound)
+    inbound_legs = _legs_by_ordinal(inbound)
+    first = min(day for _, day in outbound_legs + inbound_legs)
+    last = max(day for _, day in outbound_legs + inbound_legs)
+
+    # Dense day axis with +inf on days without a price
+    outbound_prices = np.full(last - first + 1, np.inf)
+    inbound_prices = np.full(last - first + 1, np.inf)
+    for price, day in outbound_legs:
+        outbound_prices[day - first] = price
+    for price, day in inbound_legs:
+        inbound_prices[day - first] = price
+
+    longest = last - first if max_stay is None else min(max_stay, last - first)
+    best: List[RoundTrip] = []
+    for stay in range(max(min_stay, 0), longest + 1):
+        totals = outbound_prices[: outbound_prices.size - stay] + inbound_prices[stay:]
+        position = int(np.argmin(totals))
+        if np.isfinite(totals[position]):
+            best.append(
+                _round_trip(
+                    first + position,
+                    float(outbound_prices[position]),
+                    first + position + stay,
+                    float(inbound_prices[position + stay]),
+                )
+            )
+    return best
+
+
+def cheapest_round_trips(
+    outbound: LegPrices, inbound: LegPrices, k: int = 5, min_stay: int = 0, max_stay: Optional[int] = None
+) -> List[RoundTrip]:
+    """
+    The ``k`` cheapest (departure, return) pairs whose stay is within the limits.
+    Ties are broken by departure and then return day.
+    """
+    outbound_legs = _legs_by_ordinal(outbound)
+    inbound_legs = _legs_by_ordinal(inbound)
+    if k <= 0 or not outbound_legs or not inbound_legs:
+        return []
+
+    # One cursor per outbound day into the inbound legs sorted by price
+    heap = [
+        (price + inbound_legs[0][0], day, inbound_legs[0][1], index, 0)
+        for index, (price, day) in enumerate(outbound_legs)
+    ]
+    heapq.heapify(heap)
+    trips: List[RoundTrip] = []
+    while heap and len(trips) < k:
+        _, departure, return_day, index, cursor = heapq.heappop(heap)
+        stay = return_day - departure
+        if stay >= min_stay and (max_stay is None or stay <= max_stay):
+            trips.append(_round_trip(departure, outbound_legs[index][0], return_day, inbound_legs[cursor][0]))
+        if cursor + 1 < len(inbound_legs):
+            next_price, next_day = inbound_legs[cursor + 1]
+            heapq.heappush(heap, (outbound_legs[index][0] + next_price, departure, next_day, index, cursor + 1))
+    return trips
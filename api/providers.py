@@ -0,0 +1,257 @@
+"""
+Provider adapters: the four steps every upstream search goes through.
+
+A provider turns the API query into its own request format, captures a
+browser session when it has none, fetches the raw response and extracts the
+lowest prices from it. Everything around those steps (locking, circuit
+breaking, session refresh, caching, metrics) lives in ``engine.SearchEngine``,
+so a new provider only needs a small subclass of ``ScraperProvider`` here.
+
+The scraper modules (and with them selenium_driverless, curl_cffi, arrow and
+rich) are only imported the first time a provider actually uses its scraper,
+so processes that never search start without the scraping stack.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import math
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Optional, Protocol, Tuple
+
+
+class ProviderRequest(NamedTuple):
+    origin: str
+    destination: str
+    # Dates as the provider expects them, echoed back in the response
+    departure: str
+    return_date: str
+    adults: int = 1
+
+
+class Provider(Protocol):
+    name: str
+
+    def build_request(
+        self, origin: str, destination: str, departure_date: date, return_date: date, adults: int = 1
+    ) -> ProviderRequest: ...
+
+    def has_session(self) -> bool: ...
+
+    async def capture_session(self, request: ProviderRequest) -> None: ...
+
+    def invalidate_session(self) -> None: ...
+
+    def export_session(self) -> Optional[Dict[str, Any]]: ...
+
+    def load_session(self, session: Dict[str, Any]) -> None: ...
+
+    async def fetch(self, request: ProviderRequest) -> Dict[str, Any]: ...
+
+    def extract(self, flight_data: Dict[str, Any]) -> Dict[str, Any]: ...
+
+    def summarize(self, flight_info: Dict[str, Any]) -> Dict[str, Dict[str, Optional[float]]]: ...
+
+    def leg_prices(self, request: ProviderRequest, flight_info: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, float]]]: ...
+
+    @property
+    def last_timings(self) -> Mapping[str, float]: ...
+
+
+def finite_or_none(value: Optional[float]) -> Optional[float]:
+    """Return a finite float value or None when missing/invalid."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        float_value = float(value)
+        return float_value if math.isfinite(float_value) else None
+    return None
+
+
+def sum_optional(values: Iterable[Optional[float]]) -> Optional[float]:
+    """Sum optional numeric values, returning None when all inputs are missing."""
+    total = 0.0
+    has_value = False
+    for value in values:
+        if value is not None:
+            total += float(value)
+            has_value = True
+    return total if has_value else None
+
+
+class ScraperProvider:
+    """
+    Adapter over one of the scraper classes.
+
+    ``SCRAPER`` names the (module, class) of the scraper; it is imported and
+    built with the constructor's keyword arguments on first use.
+    ``PRICE_FIELDS`` maps each price kind ("miles"/"money") to the
+    (outbound, inbound) keys of the extracted flight info.
+    """
+
+    name = ""
+    SCRAPER: Tuple[str, str] = ("", "")
+    DATE_FORMAT = "%Y-%m-%d"
+    PRICE_FIELDS: Dict[str, Tuple[str, str]] = {}
+
+    def __init__(self, **scraper_options: Any):
+        self._scraper_options = scraper_options
+        self._scraper: Any = None
+
+    @property
+    def scraper(self) -> Any:
+        if self._scraper is None:
+            module_name, class_name = self.SCRAPER
+            scraper_class = getattr(importlib.import_module(module_name), class_name)
+            self._scraper = scraper_class(**self._scraper_options)
+        return self._scraper
+
+    @property
+    def last_timings(self) -> Mapping[str, float]:
+        # Nothing was fetched yet when the scraper has not been built
+        return self._scraper.last_timings if self._scraper is not None else {}
+
+    def build_request(
+        self, origin: str, destination: str, departure_date: date, return_date: date, adults: int = 1
+    ) -> ProviderRequest:
+        return ProviderRequest(
+            origin,
+            destination,
+            departure_date.strftime(self.DATE_FORMAT),
+            return_date.strftime(self.DATE_FORMAT),
+            adults,
+        )
+
+    def has_session(self) -> bool:
+        return self._scraper is not None and self._scraper.requests_headers is not None
+
+    def invalidate_session(self) -> None:
+        if self._scraper is not None:
+            self._scraper.invalidate_session()
+
+    def export_session(self) -> Optional[Dict[str, Any]]:
+        return self._scraper.export_session() if self._scraper is not None else None
+
+    def load_session(self, session: Dict[str, Any]) -> None:
+        self.scraper.load_session(session)
+
+    async def capture_session(self, request: ProviderRequest) -> None:
+        await self.scraper.initialize_headers(
+            request.origin, request.destination, request.departure, request.return_date
+        )
+
+    async def fetch(self, request: ProviderRequest) -> Dict[str, Any]:
+        return await self.scraper.get_flight_info(
+            request.origin, request.destination, request.departure, request.return_date
+        )
+
+    def extract(self, flight_data: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def summarize(self, flight_info: Dict[str, Any]) -> Dict[str, Dict[str, Optional[float]]]:
+        """Lowest outbound, inbound and total price for each price kind."""
+        summary: Dict[str, Dict[str, Optional[float]]] = {"outbound": {}, "inbound": {}, "total": {}}
+        for kind, (outbound_key, inbound_key) in self.PRICE_FIELDS.items():
+            outbound = finite_or_none(flight_info.get(outbound_key))
+            inbound = finite_or_none(flight_info.get(inbound_key))
+            summary["outbound"][kind] = outbound
+            summary["inbound"][kind] = inbound
+            summary["total"][kind] = sum_optional([outbound, inbound])
+        return summary
+
+    def _day(self, provider_date: str) -> str:
+        return datetime.strptime(provider_date, self.DATE_FORMAT).date().isoformat()
+
+    def leg_prices(self, request: ProviderRequest, flight_info: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Lowest price of each leg per day, for each price kind:
+        {kind: {"outbound": {"YYYY-MM-DD": price}, "inbound": {...}}}.
+        Legs are priced independently, so these can be paired with other days' legs.
+        """
+        days = {"outbound": self._day(request.departure), "inbound": self._day(request.return_date)}
+        legs: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for kind, keys in self.PRICE_FIELDS.items():
+            legs[kind] = {}
+            for direction, key in zip(("outbound", "inbound"), keys):
+                price = finite_or_none(flight_info.get(key))
+                legs[kind][direction] = {days[direction]: price} if price is not None else {}
+        return legs
+
+
+class SmilesProvider(ScraperProvider):
+    name = "smiles"
+    SCRAPER = ("smiles_scraper.smiles_scraper_interceptor", "SmilesFlightSearch")
+    PRICE_FIELDS = {
+        "miles": ("lowest_outbound_miles", "lowest_inbound_miles"),
+        "money": ("lowest_outbound_money", "lowest_inbound_money"),
+    }
+
+    @staticmethod
+    def _timestamp_ms(day: str) -> int:
+        return int(datetime.strptime(day, "%Y-%m-%d").timestamp() * 1000)
+
+    async def capture_session(self, request: ProviderRequest) -> None:
+        # The Smiles search page takes the dates as millisecond timestamps
+        await self.scraper.initialize_headers(
+            request.origin,
+            request.destination,
+            self._timestamp_ms(request.departure),
+            self._timestamp_ms(request.return_date),
+        )
+
+    async def fetch(self, request: ProviderRequest) -> Dict[str, Any]:
+        # The Smiles scraper is synchronous; keep it off the event loop
+        return await asyncio.to_thread(
+            self.scraper.get_flight_info,
+            request.origin,
+            request.destination,
+            request.departure,
+            request.return_date,
+            request.adults,
+        )
+
+    def extract(self, flight_data: Dict[str, Any]) -> Dict[str, Any]:
+        return importlib.import_module(self.SCRAPER[0]).extract_flight_info(flight_data)
+
+
+class AzulProvider(ScraperProvider):
+    DATE_FORMAT = "%m/%d/%Y"
+
+    async def fetch(self, request: ProviderRequest) -> Dict[str, Any]:
+        # The engine captured the session already; the HTTP call itself blocks
+        return await asyncio.to_thread(
+            self.scraper.fetch_flight_info,
+            request.origin,
+            request.destination,
+            request.departure,
+            request.return_date,
+        )
+
+    def extract(self, flight_data: Dict[str, Any]) -> Dict[str, Any]:
+        return self.scraper.extract_flight_info(flight_data)
+
+    def leg_prices(self, request: ProviderRequest, flight_info: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, float]]]:
+        # Availability responses also carry the neighbouring days (flexible-date columns)
+        legs = super().leg_prices(request, flight_info)
+        for kind in legs:
+            for direction in ("outbound", "inbound"):
+                by_date = flight_info.get(f"{direction}_by_date") or {}
+                # Per-day columns win over the trip-wide lowest price for the requested day
+                legs[kind][direction] = {
+                    **legs[kind][direction],
+                    **{day: float(price) for day, price in by_date.items() if finite_or_none(price) is not None},
+                }
+        return legs
+
+
+class AzulMilesProvider(AzulProvider):
+    name = "azul_miles"
+    SCRAPER = ("azul_scraper.azul_scraper_api_miles", "FlightSearchMiles")
+    PRICE_FIELDS = {"miles": ("lowest_outbound", "lowest_inbound")}
+
+
+class AzulCashProvider(AzulProvider):
+    name = "azul_cash"
+    SCRAPER = ("azul_scraper.azul_scraper_api_money", "FlightSearchMoney")
+    PRICE_FIELDS = {"money": ("lowest_outbound", "lowest_inbound")}
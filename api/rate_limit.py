@@ -0,0 +1,183 @@
+"""
+Upstream request pacing for the providers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Deque, Iterator, Optional
+
+
+class IntervalLimiter:
+    """Space out calls so at most one starts every ``min_interval`` seconds."""
+
+    def __init__(self, min_interval: float, clock: Callable[[], float] = time.monotonic):
+        self.min_interval = min_interval
+        self._clock = clock
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            delay = self._next_slot - self._clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_slot = self._clock() + self.min_interval
+
+
+class RequestBudget:
+    """Allow at most ``max_requests`` calls in any sliding window of ``period`` seconds."""
+
+    def __init__(self, max_requests: int, period: float, clock: Callable[[], float] = time.monotonic):
+        self.max_requests = max_requests
+        self.period = period
+        self._clock = clock
+        self._calls: Deque[float] = deque()
+
+    def _expire(self, now: float) -> None:
+        while self._calls and now - self._calls[0] >= self.period:
+            self._calls.popleft()
+
+    def try_acquire(self) -> bool:
+        """Consume one call from the budget, returning False when it is exhausted."""
+        now = self._clock()
+        self._expire(now)
+        if len(self._calls) >= self.max_requests:
+            return False
+        self._calls.append(now)
+        return True
+
+    def next_available_in(self) -> float:
+        """Seconds until another call fits in the budget."""
+        now = self._clock()
+        self._expire(now)
+        if len(self._calls) < self.max_requests:
+            return 0.0
+        return self._calls[0] + self.period - now
+
+
+class AdaptiveTokenBucket:
+    """
+    Per-provider token bucket shared by every worker process, with AIMD rate control.
+
+    The bucket state lives in a SQLite row updated under ``BEGIN IMMEDIATE``,
+    so all workers draw from the same budget. Each call reserves a token and
+    sleeps until it is due (the bucket may go into debt, which queues callers
+    fairly across processes). Throttling, challenge pages and latency spikes
+    halve the rate; every clean response adds ``increase`` requests/second
+    back, up to ``max_rate``.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS upstream_buckets (
+        provider TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        rate REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        provider: str,
+        initial_rate: float = 0.5,
+        min_rate: float = 0.05,
+        max_rate: float = 2.0,
+        burst: float = 3.0,
+        increase: float = 0.02,
+        decrease_factor: float = 0.5,
+        slow_response_seconds: float = 8.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.provider = provider
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.slow_response_seconds = slow_response_seconds
+        self._clock = clock
+        self._initialized = False
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            if not self._initialized:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(self.SCHEMA)
+                self._initialized = True
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _state(self, conn: sqlite3.Connection, now: float):
+        """Current (tokens, rate), refilled up to ``now``."""
+        row = conn.execute(
+            "SELECT tokens, rate, updated_at FROM upstream_buckets WHERE provider = ?", (self.provider,)
+        ).fetchone()
+        if row is None:
+            return self.burst, self.initial_rate
+        tokens, rate, updated_at = row
+        return min(self.burst, tokens + max(0.0, now - updated_at) * rate), rate
+
+    def _store(self, conn: sqlite3.Connection, tokens: float, rate: float, now: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO upstream_buckets (provider, tokens, rate, updated_at) VALUES (?, ?, ?, ?)",
+            (self.provider, tokens, rate, now),
+        )
+
+    def reserve(self) -> float:
+        """Take one token, returning how many seconds the caller must wait before using it."""
+        now = self._clock()
+        with self._transaction() as conn:
+            tokens, rate = self._state(conn, now)
+            tokens -= 1.0
+            self._store(conn, tokens, rate, now)
+        return max(0.0, -tokens / rate)
+
+    async def acquire(self) -> None:
+        delay = await asyncio.to_thread(self.reserve)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record(self, throttled: bool = False, challenged: bool = False, latency: Optional[float] = None) -> float:
+        """Feed back the outcome of a call; returns the new rate in requests/second."""
+        slow = latency is not None and latency > self.slow_response_seconds
+        now = self._clock()
+        with self._transaction() as conn:
+            tokens, rate = self._state(conn, now)
+            if throttled or challenged or slow:
+                new_rate = max(self.min_rate, rate * self.decrease_factor)
+                # Drop the saved-up burst as well, so the slowdown is immediate
+                tokens = min(tokens, 0.0)
+            else:
+                new_rate = min(self.max_rate, rate + self.increase)
+            self._store(conn, tokens, new_rate, now)
+        if new_rate < rate:
+            reason = "throttled" if throttled else "challenge" if challenged else f"slow response ({latency:.1f}s)"
+            print(f"Upstream rate for {self.provider} lowered to {new_rate:.3f} req/s: {reason}")
+        return new_rate
+
+    async def feedback(self, throttled: bool = False, challenged: bool = False, latency: Optional[float] = None) -> float:
+        return await asyncio.to_thread(self.record, throttled, challenged, latency)
+
+    def current_rate(self) -> float:
+        now = self._clock()
+        with self._transaction() as conn:
+            return self._state(conn, now)[1]
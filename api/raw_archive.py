@@ -0,0 +1,159 @@
+"""
+Opt-in archive of the raw provider responses.
+
+The methodology keeps the raw JSON of every search for later analysis. The
+availability payloads are large and very repetitive (the same route is
+searched again and again and often comes back identical), so the archive is
+content-addressed: each distinct payload is stored once, zstd-compressed,
+under the SHA-256 of its canonical JSON, and every capture is a small index
+row (provider, route, dates, capture time, hash) pointing at it.
+
+Both live in one SQLite file in WAL mode, so several worker processes can
+archive concurrently and the index lookups by route and date use a B-tree.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - the archive is disabled without zstandard
+    zstandard = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_payloads (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS raw_captures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    provider TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    departure_date TEXT NOT NULL,
+    return_date TEXT NOT NULL,
+    captured_at REAL NOT NULL,
+    hash TEXT NOT NULL REFERENCES raw_payloads(hash)
+);
+CREATE INDEX IF NOT EXISTS idx_raw_captures_route
+    ON raw_captures(origin, destination, departure_date, captured_at);
+"""
+
+
+def canonical_json(payload: Any) -> bytes:
+    """Byte-stable JSON of a payload, so equal responses hash to the same address."""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class RawArchive:
+    def __init__(self, path: Path, level: int = 10, clock: Callable[[], float] = time.time):
+        if zstandard is None:
+            raise RuntimeError("The raw response archive needs the zstandard package")
+        self.path = path
+        self.level = level
+        self._clock = clock
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            if not self._initialized:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            if immediate:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            else:
+                yield conn
+        finally:
+            conn.close()
+
+    def store(
+        self, provider: str, origin: str, destination: str, departure_date: str, return_date: str, payload: Any
+    ) -> str:
+        """Archive one response and return its content hash; known payloads are not stored again."""
+        data = canonical_json(payload)
+        digest = hashlib.sha256(data).hexdigest()
+        with self._connect() as conn:
+            known = conn.execute("SELECT 1 FROM raw_payloads WHERE hash = ?", (digest,)).fetchone()
+        # Compress outside the write lock; only new payloads pay for it
+        compressed = None if known else zstandard.ZstdCompressor(level=self.level).compress(data)
+        with self._connect(immediate=True) as conn:
+            if compressed is not None:
+                conn.execute(
+                    "INSERT OR IGNORE INTO raw_payloads (hash, size, data) VALUES (?, ?, ?)",
+                    (digest, len(data), compressed),
+                )
+            conn.execute(
+                """
+                INSERT INTO raw_captures (provider, origin, destination, departure_date, return_date, captured_at, hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (provider, origin.upper(), destination.upper(), departure_date, return_date, self._clock(), digest),
+            )
+        return digest
+
+    def captures(
+        self,
+        origin: str,
+        destination: str,
+        departure_date: Optional[str] = None,
+        provider: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Index rows of a route, newest first, optionally for one departure day, provider or after a time."""
+        clauses = ["origin = ?", "destination = ?"]
+        params: List[Any] = [origin.upper(), destination.upper()]
+        for clause, value in (
+            ("departure_date = ?", departure_date),
+            ("provider = ?", provider),
+            ("captured_at >= ?", since),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"""
+                SELECT id, provider, origin, destination, departure_date, return_date, captured_at, hash
+                FROM raw_captures WHERE {' AND '.join(clauses)}
+                ORDER BY captured_at DESC LIMIT ?
+                """,
+                (*params, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def payload(self, digest: str) -> Optional[Any]:
+        """The archived response with that content hash, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM raw_payloads WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zstandard.ZstdDecompressor().decompress(row[0]))
+
+    def stats(self) -> Dict[str, int]:
+        """Captures, distinct payloads, and raw vs stored bytes of the payloads."""
+        with self._connect() as conn:
+            captures = conn.execute("SELECT COUNT(*) FROM raw_captures").fetchone()[0]
+            payloads, raw_bytes, stored_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM raw_payloads"
+            ).fetchone()
+        return {"captures": captures, "payloads": payloads, "raw_bytes": raw_bytes, "stored_bytes": stored_bytes}
@@ -0,0 +1,164 @@
+"""
+Which provider serves which route, learned from history and from searches.
+
+Azul and Smiles (GOL and its partners) fly different networks, so many
+routes only make sense on some providers. The graph keeps, per route (the
+unordered pair of cities, since every search is a round trip), how often
+each provider was seen serving it: historical fares count for the provider
+of their loyalty program (or of the operating airline on rows without a
+program), and every search result counts as served or empty.
+
+A provider with no evidence of serving a route is deprioritized; once the
+route has enough history for other providers, or the provider came back
+empty in several distinct date windows (a few sold-out days on a real route
+do not count), it is skipped altogether, except for one recheck per
+``recheck_seconds`` so a new route is eventually noticed.
+
+The historical adjacency is rebuilt by ``refresh`` when the history database
+changes, off the request path (e.g. registered with ``SnapshotStore.on_reload``
+so it runs in the snapshot's reload thread, with ``version`` reading the
+snapshot's version). Lookups only read the prebuilt adjacency.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+try:
+    from .cities import CIDADES
+    from .conditional import database_version
+except ImportError:  # pragma: no cover
+    from api.cities import CIDADES
+    from api.conditional import database_version
+
+RoutePair = Tuple[str, str]
+
+SERVES = "serves"
+UNKNOWN = "unknown"
+ABSENT = "absent"
+
+_STATUS_ORDER = {SERVES: 0, UNKNOWN: 1, ABSENT: 2}
+
+
+class RouteGraph:
+    def __init__(
+        self,
+        db_path: Path,
+        program_providers: Mapping[str, Sequence[str]],
+        airline_providers: Mapping[str, Sequence[str]],
+        min_history: int = 5,
+        skip_after_empty: int = 3,
+        empty_window_days: int = 7,
+        recheck_seconds: float = 86400.0,
+        version: Optional[Callable[[], str]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.db_path = db_path
+        self._program_providers = {name.upper(): tuple(providers) for name, providers in program_providers.items()}
+        self._airline_providers = {name.upper(): tuple(providers) for name, providers in airline_providers.items()}
+        self.min_history = min_history
+        self.skip_after_empty = skip_after_empty
+        self.empty_window_days = empty_window_days
+        self.recheck_seconds = recheck_seconds
+        self._version_source = version
+        self._clock = clock
+        # Adjacency: route -> provider -> historical rows served
+        self._history: Dict[RoutePair, Dict[str, int]] = {}
+        # route -> provider -> searches with flights
+        self._served: Dict[RoutePair, Dict[str, int]] = {}
+        # route -> provider -> departure windows (day ordinal // empty_window_days) searched without flights
+        self._empty_windows: Dict[RoutePair, Dict[str, Set[int]]] = {}
+        self._last_recheck: Dict[Tuple[str, RoutePair], float] = {}
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _route(origin: str, destination: str) -> RoutePair:
+        # Searches use IATA codes, the history stores city names
+        first = CIDADES.get(origin.strip().upper(), origin).upper()
+        second = CIDADES.get(destination.strip().upper(), destination).upper()
+        return (first, second) if first <= second else (second, first)
+
+    def _read_rows(self) -> List[Tuple[str, str, Optional[str], Optional[str]]]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(historical_fares)")}
+            if not columns:
+                return []
+            program = "program" if "program" in columns else "NULL AS program"
+            airlines = "airlines" if "airlines" in columns else "NULL AS airlines"
+            return conn.execute(f"SELECT origin, destination, {program}, {airlines} FROM historical_fares").fetchall()
+        finally:
+            conn.close()
+
+    def _load(self, version: str) -> None:
+        history: Dict[RoutePair, Dict[str, int]] = {}
+        for origin, destination, program, airlines in self._read_rows():
+            providers = self._program_providers.get((program or "").strip().upper())
+            if providers is None:
+                providers = tuple(
+                    provider
+                    for airline in (airlines or "").split(",")
+                    for provider in self._airline_providers.get(airline.strip().upper(), ())
+                )
+            if not providers or not origin or not destination:
+                continue
+            first, second = origin.upper(), destination.upper()
+            counts = history.setdefault((first, second) if first <= second else (second, first), {})
+            for provider in providers:
+                counts[provider] = counts.get(provider, 0) + 1
+        self._history = history
+        self._version = version
+
+    def refresh(self) -> None:
+        """Rebuild the historical adjacency when the database file changed since the last load."""
+        version = self._version_source() if self._version_source is not None else database_version(self.db_path)
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                self._load(version)
+
+    def status(self, provider: str, origin: str, destination: str) -> str:
+        """SERVES, UNKNOWN (no evidence either way) or ABSENT (evidence it does not)."""
+        route = self._route(origin, destination)
+        history = self._history.get(route, {})
+        served = self._served.get(route, {}).get(provider, 0)
+        empty_windows = len(self._empty_windows.get(route, {}).get(provider, ()))
+        if history.get(provider) or served:
+            return SERVES
+        if empty_windows >= self.skip_after_empty or sum(history.values()) >= self.min_history:
+            return ABSENT
+        return UNKNOWN
+
+    def should_query(self, provider: str, origin: str, destination: str) -> bool:
+        """False when the provider does not serve the route, unless its periodic recheck is due."""
+        if self.status(provider, origin, destination) != ABSENT:
+            return True
+        key = (provider, self._route(origin, destination))
+        now = self._clock()
+        last = self._last_recheck.get(key)
+        if last is not None and now - last < self.recheck_seconds:
+            return False
+        self._last_recheck[key] = now
+        # The first skip only starts the recheck clock
+        return last is not None
+
+    def rank(self, providers: Sequence[str], origin: str, destination: str) -> List[str]:
+        """Providers known to serve the route first, then the unknown ones, then the absent ones."""
+        return sorted(providers, key=lambda provider: _STATUS_ORDER[self.status(provider, origin, destination)])
+
+    def observe(self, provider: str, origin: str, destination: str, departure: date, served: bool) -> None:
+        """Record whether a search of the provider found flights on the route for that departure day."""
+        route = self._route(origin, destination)
+        if served:
+            counts = self._served.setdefault(route, {})
+            counts[provider] = counts.get(provider, 0) + 1
+        else:
+            windows = self._empty_windows.setdefault(route, {}).setdefault(provider, set())
+            windows.add(departure.toordinal() // self.empty_window_days)
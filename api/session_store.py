@@ -0,0 +1,137 @@
+"""
+Provider sessions shared between worker processes.
+
+With ``uvicorn --workers N`` every worker has its own scraper singletons. The
+store keeps the last captured session of each provider in a small SQLite
+file so one worker captures and the others adopt the result. A capture lease
+(one row per provider, with an expiry) makes sure only one worker opens a
+browser at a time; the others poll the store until the session shows up or
+the lease expires. Writes use ``BEGIN IMMEDIATE`` so the lease check and the
+claim happen under SQLite's file lock.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS provider_sessions (
+    provider TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    payload TEXT,
+    captured_at REAL NOT NULL,
+    captured_by TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS capture_leases (
+    provider TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SessionStore:
+    def __init__(
+        self,
+        path: Path,
+        max_age: float = 1800.0,
+        lease_seconds: float = 90.0,
+        poll_interval: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._clock = clock
+        # Identifies this process' leases and captures
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            if not self._initialized:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            if immediate:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            else:
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self, provider: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Return (version, session) of the provider's shared session when one is fresh enough."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT version, payload, captured_at FROM provider_sessions WHERE provider = ?",
+                (provider,),
+            ).fetchone()
+        if row is None or row[1] is None or self._clock() - row[2] > self.max_age:
+            return None
+        return row[0], json.loads(row[1])
+
+    def save(self, provider: str, session: Dict[str, Any]) -> int:
+        """Publish a freshly captured session, returning its version."""
+        with self._connect(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT version FROM provider_sessions WHERE provider = ?", (provider,)
+            ).fetchone()
+            version = (row[0] if row else 0) + 1
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO provider_sessions (provider, version, payload, captured_at, captured_by)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (provider, version, json.dumps(session), self._clock(), self.owner),
+            )
+        return version
+
+    def discard(self, provider: str, version: Optional[int]) -> None:
+        """Drop a rejected session, unless another worker already replaced it."""
+        if version is None:
+            return
+        # The row stays so the version keeps increasing for the next capture
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "UPDATE provider_sessions SET payload = NULL WHERE provider = ? AND version = ?",
+                (provider, version),
+            )
+
+    def try_acquire(self, provider: str) -> bool:
+        """Claim the capture lease for the provider; False while another worker holds it."""
+        now = self._clock()
+        with self._connect(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT owner, expires_at FROM capture_leases WHERE provider = ?", (provider,)
+            ).fetchone()
+            if row is not None and row[0] != self.owner and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO capture_leases (provider, owner, expires_at) VALUES (?, ?, ?)",
+                (provider, self.owner, now + self.lease_seconds),
+            )
+        return True
+
+    def release(self, provider: str) -> None:
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "DELETE FROM capture_leases WHERE provider = ? AND owner = ?", (provider, self.owner)
+            )
@@ -0,0 +1,53 @@
+"""
+Background re-capture of provider sessions rejected by the upstream.
+
+When a provider refuses the captured cookies (expired Akamai tokens, 401/403,
+HTML challenge) a single capture task is started for that provider. Callers
+do not wait for it: while it runs, searches are answered from the result
+cache, so a burst of requests never turns into a burst of browser launches.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+
+class SessionRefresher:
+    def __init__(
+        self,
+        provider: str,
+        lock: asyncio.Lock,
+        invalidate: Callable[[], None],
+        capture: Callable[..., Awaitable[None]],
+    ):
+        self.provider = provider
+        self._lock = lock
+        self._invalidate = invalidate
+        self._capture = capture
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def refreshing(self) -> bool:
+        return self._task is not None
+
+    def trigger(self, *capture_args: Any) -> bool:
+        """
+        Start a background re-capture unless one is already running.
+
+        Returns True when this call started the capture.
+        """
+        if self._task is not None:
+            return False
+        self._task = asyncio.get_running_loop().create_task(self._refresh(capture_args))
+        return True
+
+    async def _refresh(self, capture_args: tuple) -> None:
+        try:
+            async with self._lock:
+                self._invalidate()
+                await self._capture(*capture_args)
+        except Exception as exc:
+            print(f"Session re-capture for {self.provider} failed: {exc}")
+        finally:
+            self._task = None
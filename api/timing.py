@@ -0,0 +1,70 @@
+"""
+Lightweight span recorder backing the Server-Timing response header.
+
+A recorder is bound to the current request through a context variable, so
+helpers deep inside the search path can record phases without threading an
+object through every call. When no recorder is active (header disabled or
+code running outside a request) recording is a single ContextVar lookup.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, Optional, Tuple
+
+ENABLED = os.getenv("TCC_SERVER_TIMING", "1").lower() not in {"0", "false", "no"}
+
+_current: ContextVar[Optional["SpanRecorder"]] = ContextVar("tcc_span_recorder", default=None)
+
+
+class SpanRecorder:
+    """Accumulate named durations (in seconds) for a single request."""
+
+    __slots__ = ("_spans",)
+
+    def __init__(self) -> None:
+        self._spans: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self._spans[name] = self._spans.get(name, 0.0) + seconds
+
+    def header(self) -> str:
+        """Render the spans as a Server-Timing header value (durations in ms)."""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in self._spans.items()
+        )
+
+
+def begin() -> Tuple[SpanRecorder, Token]:
+    recorder = SpanRecorder()
+    return recorder, _current.set(recorder)
+
+
+def end(token: Token) -> None:
+    _current.reset(token)
+
+
+def record(name: str, seconds: Optional[float]) -> None:
+    """Add an externally measured duration to the active recorder, if any."""
+    if seconds is None:
+        return
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add(name, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the wrapped block into the active recorder, if any."""
+    recorder = _current.get()
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, time.perf_counter() - start)
@@ -0,0 +1,57 @@
+"""
+Cheap checks run on a search before any provider work.
+
+A query that can never return flights (unknown airport, origin and
+destination in the same city, dates in the past or in the wrong order) is
+rejected here in microseconds, instead of locking a provider, capturing a
+browser session and scraping three upstreams to find out.
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Optional
+
+try:
+    from .cities import CIDADES
+except ImportError:  # pragma: no cover
+    from api.cities import CIDADES
+
+# The airlines sell about a year ahead
+MAX_DAYS_AHEAD = 360
+MAX_ADULTS = 9
+
+
+def route_error(origin: str, destination: str) -> Optional[str]:
+    """Why the route cannot be searched, or None when it can."""
+    origin_code = origin.strip().upper()
+    destination_code = destination.strip().upper()
+    unknown = [code for code in (origin_code, destination_code) if code not in CIDADES]
+    if unknown:
+        return f"Unknown airport codes: {', '.join(unknown)}"
+    if origin_code == destination_code:
+        return "Origin and destination must be different"
+    if CIDADES[origin_code] == CIDADES[destination_code]:
+        return f"{origin_code} and {destination_code} are both in {CIDADES[origin_code]}"
+    return None
+
+
+def dates_error(departure_date: date, return_date: date, today: Optional[date] = None) -> Optional[str]:
+    """Why the dates cannot be searched, or None when they can."""
+    today = today or date.today()
+    if departure_date < today:
+        return f"Departure date {departure_date.isoformat()} is in the past"
+    if return_date < departure_date:
+        return "Return date must not be before the departure date"
+    if return_date > today + timedelta(days=MAX_DAYS_AHEAD):
+        return f"Dates more than {MAX_DAYS_AHEAD} days ahead are not on sale yet"
+    return None
+
+
+def search_error(
+    origin: str, destination: str, departure_date: date, return_date: date, adults: int = 1, today: Optional[date] = None
+) -> Optional[str]:
+    """First reason the search would be wasted upstream, or None when it is worth running."""
+    if not 1 <= adults <= MAX_ADULTS:
+        return f"adults must be between 1 and {MAX_ADULTS}"
+    return route_error(origin, destination) or dates_error(departure_date, return_date, today)
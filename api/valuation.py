@@ -0,0 +1,164 @@
+"""
+Miles-vs-cash valuation derived from the historical fares.
+
+Every historical row records what its miles cost to buy (``price_per_mile``,
+the CSV's Milheiro) and the cash fare they replaced (``cash_fare``). The
+table aggregates both per route and loyalty program, and per program, once
+per database version and keeps them in memory. ``refresh`` rebuilds them
+off the request path (e.g. registered with ``SnapshotStore.on_reload``, with
+``version`` reading the snapshot's version), so annotating a search result is
+only a couple of dict lookups.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import statistics
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from .conditional import database_version
+except ImportError:  # pragma: no cover
+    from api.conditional import database_version
+
+RouteKey = Tuple[str, str, str]
+
+
+class MileValue(NamedTuple):
+    # R$ paid per mile bought in the program
+    cost_per_mile: float
+    # R$ of cash fare replaced per mile redeemed, when known
+    value_per_mile: Optional[float]
+    samples: int
+    # "route", "program" or "default"
+    source: str
+
+
+def _median(values: List[float]) -> Optional[float]:
+    return statistics.median(values) if values else None
+
+
+class ValuationTable:
+    def __init__(
+        self,
+        db_path: Path,
+        default_price_per_mile: float,
+        resolve_city: Callable[[str], Optional[str]],
+        version: Optional[Callable[[], str]] = None,
+    ):
+        self.db_path = db_path
+        self.default_price_per_mile = default_price_per_mile
+        self._resolve_city = resolve_city
+        self._version_source = version
+        self._routes: Dict[RouteKey, MileValue] = {}
+        self._programs: Dict[str, MileValue] = {}
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _read_rows(self) -> List[sqlite3.Row]:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(historical_fares)")}
+            if not columns:
+                return []
+            # Databases migrated before these columns existed only carry the miles cost
+            program = "program" if "program" in columns else "NULL AS program"
+            price = "price_per_mile" if "price_per_mile" in columns else "NULL AS price_per_mile"
+            cash_fare = "cash_fare" if "cash_fare" in columns else "NULL AS cash_fare"
+            return conn.execute(
+                f"""
+                SELECT origin, destination, total_miles, total_cash, {program}, {price}, {cash_fare}
+                FROM historical_fares
+                WHERE total_miles > 0
+                """
+            ).fetchall()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _aggregate(costs: List[float], values: List[float], source: str) -> MileValue:
+        return MileValue(_median(costs), _median(values), len(costs), source)
+
+    def _load(self, version: str) -> None:
+        route_samples: Dict[RouteKey, Tuple[List[float], List[float]]] = {}
+        program_samples: Dict[str, Tuple[List[float], List[float]]] = {}
+        for row in self._read_rows():
+            miles = row["total_miles"]
+            cost = row["price_per_mile"]
+            if cost is None and row["total_cash"] is not None:
+                cost = row["total_cash"] / miles
+            if cost is None:
+                continue
+            value = row["cash_fare"] / miles if row["cash_fare"] is not None else None
+            program = (row["program"] or "").upper()
+            buckets = [route_samples.setdefault((row["origin"].upper(), row["destination"].upper(), program), ([], []))]
+            if program:
+                buckets.append(program_samples.setdefault(program, ([], [])))
+            for costs, values in buckets:
+                costs.append(cost)
+                if value is not None:
+                    values.append(value)
+
+        self._routes = {key: self._aggregate(*samples, "route") for key, samples in route_samples.items()}
+        self._programs = {key: self._aggregate(*samples, "program") for key, samples in program_samples.items()}
+        self._version = version
+
+    def refresh(self) -> None:
+        """Rebuild the in-memory table when the database file changed since the last load."""
+        version = self._version_source() if self._version_source is not None else database_version(self.db_path)
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                self._load(version)
+
+    def lookup(self, origin: str, destination: str, program: str) -> MileValue:
+        """Most specific historical valuation: route and program, then program, then the default."""
+        program_key = program.upper()
+        origin_name = (self._resolve_city(origin) or origin).upper()
+        destination_name = (self._resolve_city(destination) or destination).upper()
+        for candidate in (
+            self._routes.get((origin_name, destination_name, program_key)),
+            self._programs.get(program_key),
+            # Legacy databases have no program column: route-wide value
+            self._routes.get((origin_name, destination_name, "")),
+        ):
+            if candidate is not None and candidate.cost_per_mile is not None:
+                return candidate
+        return MileValue(self.default_price_per_mile, None, 0, "default")
+
+    def appraise(
+        self, origin: str, destination: str, program: str, miles: float, cash: Optional[float]
+    ) -> Dict[str, Any]:
+        """
+        Cash equivalent of a miles price and whether miles or cash is the better buy.
+
+        ``cash`` is the live cash price for the same trip; without it the
+        historical cash fare replaced per mile on the route is used instead.
+        """
+        valuation = self.lookup(origin, destination, program)
+        equivalent = miles * valuation.cost_per_mile
+        reference = "live" if cash is not None else None
+        if cash is None and valuation.value_per_mile is not None:
+            cash = miles * valuation.value_per_mile
+            reference = "historical"
+
+        better_buy = None
+        savings = None
+        if cash is not None:
+            better_buy = "miles" if equivalent < cash else "cash"
+            savings = round(cash - equivalent, 2)
+        return {
+            "program": program,
+            "price_per_mile": valuation.cost_per_mile,
+            "price_per_mile_source": valuation.source,
+            "samples": valuation.samples,
+            "miles_cash_equivalent": round(equivalent, 2),
+            "cash_price": round(cash, 2) if cash is not None else None,
+            "cash_reference": reference,
+            "better_buy": better_buy,
+            "savings": savings,
+        }
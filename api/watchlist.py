@@ -0,0 +1,337 @@
+"""
+Persistent watchlist of routes and the background crawler that scrapes them.
+
+Each watchlist entry is a route, a departure window and a stay length; it
+expands into one job per departure date. Jobs wait in a time-ordered heap
+until due, then run by priority (1 = most urgent). Every provider call that
+reaches the upstream (not answered from a cache) is charged to that
+provider's hourly budget, jobs are spread out with random jitter, and
+results are written to ``scraped_fares``. The watchlist has its
+own SQLite file: writing to the history database would change its version
+and invalidate every snapshot, ETag and table derived from it. A fare is
+flagged when it beats the best historical total for the route, read from the
+history database again whenever its version changes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+try:
+    from .conditional import database_version
+    from .rate_limit import RequestBudget
+except ImportError:  # pragma: no cover
+    from api.conditional import database_version
+    from api.rate_limit import RequestBudget
+
+# runner(provider, origin, destination, departure, return_date, admit): admit() is called right
+# before an upstream fetch and may refuse it, in which case the result is flagged "deferred"
+WatchRunner = Callable[[str, str, str, date, date, Callable[[], bool]], Awaitable[Dict[str, Any]]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    departure_from TEXT NOT NULL,
+    departure_to TEXT NOT NULL,
+    stay_days INTEGER NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 5,
+    interval_minutes INTEGER NOT NULL DEFAULT 360,
+    active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scraped_fares (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    watch_id INTEGER,
+    provider TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    departure_date TEXT NOT NULL,
+    return_date TEXT NOT NULL,
+    total_miles REAL,
+    total_cash REAL,
+    beats_historical INTEGER NOT NULL DEFAULT 0,
+    scraped_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scraped_fares_route
+    ON scraped_fares (origin, destination, departure_date);
+"""
+
+
+class WatchEntry(BaseModel):
+    origin: str = Field(..., min_length=3, max_length=3)
+    destination: str = Field(..., min_length=3, max_length=3)
+    departure_from: date
+    departure_to: date
+    stay_days: int = Field(..., ge=1, le=60)
+    priority: int = Field(5, ge=1, le=10)
+    interval_minutes: int = Field(360, ge=15)
+
+
+def init_db(db_path: Path) -> None:
+    """Create the watchlist database and its tables; run once at startup."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(SCHEMA)
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _connect(db_path: Path) -> Iterator[sqlite3.Connection]:
+    """Open the watchlist database, committing on success."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def add_entry(db_path: Path, entry: WatchEntry) -> int:
+    with _connect(db_path) as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO watchlist (
+                origin, destination, departure_from, departure_to,
+                stay_days, priority, interval_minutes, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                entry.origin.upper(),
+                entry.destination.upper(),
+                entry.departure_from.isoformat(),
+                entry.departure_to.isoformat(),
+                entry.stay_days,
+                entry.priority,
+                entry.interval_minutes,
+                _now(),
+            ),
+        )
+        return int(cursor.lastrowid)
+
+
+def deactivate_entry(db_path: Path, entry_id: int) -> bool:
+    with _connect(db_path) as conn:
+        cursor = conn.execute("UPDATE watchlist SET active = 0 WHERE id = ? AND active = 1", (entry_id,))
+        return cursor.rowcount > 0
+
+
+def list_entries(db_path: Path) -> List[Dict[str, Any]]:
+    with _connect(db_path) as conn:
+        rows = conn.execute("SELECT * FROM watchlist WHERE active = 1 ORDER BY priority, id").fetchall()
+    return [dict(row) for row in rows]
+
+
+def recent_alerts(db_path: Path, limit: int = 50) -> List[Dict[str, Any]]:
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT * FROM scraped_fares WHERE beats_historical = 1 ORDER BY scraped_at DESC, id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+class _Job:
+    __slots__ = ("watch_id", "origin", "destination", "departure", "return_date", "priority", "interval")
+
+    def __init__(self, row: Mapping[str, Any], departure: date):
+        self.watch_id = row["id"]
+        self.origin = row["origin"]
+        self.destination = row["destination"]
+        self.departure = departure
+        self.return_date = departure + timedelta(days=row["stay_days"])
+        self.priority = row["priority"]
+        self.interval = row["interval_minutes"] * 60.0
+
+
+def expand_entry(row: Mapping[str, Any], today: Optional[date] = None) -> List[_Job]:
+    """One job per future departure date in the entry's window."""
+    today = today or date.today()
+    start = max(date.fromisoformat(row["departure_from"]), today)
+    end = date.fromisoformat(row["departure_to"])
+    return [_Job(row, start + timedelta(days=offset)) for offset in range((end - start).days + 1)]
+
+
+class WatchlistCrawler:
+    def __init__(
+        self,
+        db_path: Path,
+        history_path: Path,
+        runner: WatchRunner,
+        resolve_city: Callable[[str], Optional[str]],
+        providers: Sequence[str],
+        budgets: Mapping[str, RequestBudget],
+        jitter: float = 5.0,
+        reload_interval: float = 60.0,
+        history_version: Optional[Callable[[], str]] = None,
+    ):
+        self.db_path = db_path
+        self.history_path = history_path
+        self._runner = runner
+        self._resolve_city = resolve_city
+        self.providers = list(providers)
+        self._budgets = budgets
+        self.jitter = jitter
+        self.reload_interval = reload_interval
+        self._history_version = history_version
+        self._seq = itertools.count()
+        # (run_at, seq, job) waiting for their time; (priority, seq, job) ready to run
+        self._waiting: List[Tuple[float, int, _Job]] = []
+        self._due: List[Tuple[int, int, _Job]] = []
+        self._scheduled: Set[int] = set()
+        # Per-route historical best, valid for one version of the history database
+        self._historical_best: Dict[Tuple[str, str], Tuple[Optional[float], Optional[float]]] = {}
+        self._historical_version: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _push(self, job: _Job, run_at: float) -> None:
+        heapq.heappush(self._waiting, (run_at, next(self._seq), job))
+
+    def _reload(self) -> None:
+        """Schedule jobs for new watchlist entries and forget removed ones."""
+        entries = {row["id"]: row for row in list_entries(self.db_path)}
+        self._scheduled &= set(entries)
+        now = time.monotonic()
+        for watch_id, row in entries.items():
+            if watch_id in self._scheduled:
+                continue
+            self._scheduled.add(watch_id)
+            for job in expand_entry(row):
+                self._push(job, now)
+
+    def _promote_due(self) -> None:
+        now = time.monotonic()
+        while self._waiting and self._waiting[0][0] <= now:
+            _, seq, job = heapq.heappop(self._waiting)
+            heapq.heappush(self._due, (job.priority, seq, job))
+
+    async def _run(self) -> None:
+        last_reload = float("-inf")
+        while True:
+            if time.monotonic() - last_reload >= self.reload_interval:
+                await asyncio.to_thread(self._reload)
+                last_reload = time.monotonic()
+            self._promote_due()
+            if not self._due:
+                next_run = self._waiting[0][0] - time.monotonic() if self._waiting else self.reload_interval
+                await asyncio.sleep(max(0.0, min(next_run, self.reload_interval)))
+                continue
+
+            _, _, job = heapq.heappop(self._due)
+            if job.watch_id not in self._scheduled or job.departure < date.today():
+                continue
+            try:
+                await self._crawl(job)
+            except Exception as exc:
+                print(f"Watchlist job {job.origin}->{job.destination} {job.departure} failed: {exc}")
+            await asyncio.sleep(random.uniform(0, self.jitter))
+
+    async def _crawl(self, job: _Job) -> None:
+        deferred = 0
+        for provider in self.providers:
+            # Only a real upstream fetch is charged; cached answers are free
+            result = await self._runner(
+                provider, job.origin, job.destination, job.departure, job.return_date, self._budgets[provider].try_acquire
+            )
+            if result.get("deferred"):
+                deferred += 1
+                continue
+            await asyncio.to_thread(self._store, job, provider, result)
+        if deferred == len(self.providers):
+            # Every provider is out of budget: retry when the first one frees up.
+            wait = min(self._budgets[name].next_available_in() for name in self.providers)
+            self._push(job, time.monotonic() + wait + random.uniform(0, self.jitter))
+            return
+        spread = random.uniform(0.9, 1.1)
+        self._push(job, time.monotonic() + job.interval * spread)
+
+    def _best_for(self, origin: str, destination: str) -> Tuple[Optional[float], Optional[float]]:
+        version = (
+            self._history_version() if self._history_version is not None else database_version(self.history_path)
+        )
+        if version != self._historical_version:
+            self._historical_best = {}
+            self._historical_version = version
+        key = (origin, destination)
+        if key not in self._historical_best:
+            conn = sqlite3.connect(f"{self.history_path.resolve().as_uri()}?mode=ro", uri=True)
+            try:
+                row = conn.execute(
+                    """
+                    SELECT MIN(total_miles), MIN(total_cash)
+                    FROM historical_fares
+                    WHERE UPPER(origin) = UPPER(?) AND UPPER(destination) = UPPER(?)
+                    """,
+                    (self._resolve_city(origin), self._resolve_city(destination)),
+                ).fetchone()
+            finally:
+                conn.close()
+            self._historical_best[key] = (row[0], row[1]) if row else (None, None)
+        return self._historical_best[key]
+
+    def _store(self, job: _Job, provider: str, result: Dict[str, Any]) -> None:
+        if "error" in result or result.get("stale"):
+            return
+        total = result.get("total") or {}
+        miles, cash = total.get("miles"), total.get("money")
+        if miles is None and cash is None:
+            return
+        best_miles, best_cash = self._best_for(job.origin, job.destination)
+        beats = (miles is not None and best_miles is not None and miles < best_miles) or (
+            cash is not None and best_cash is not None and cash < best_cash
+        )
+        with _connect(self.db_path) as conn:
+            conn.execute(
+                """
+                INSERT INTO scraped_fares (
+                    watch_id, provider, origin, destination, departure_date,
+                    return_date, total_miles, total_cash, beats_historical, scraped_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job.watch_id,
+                    provider,
+                    job.origin,
+                    job.destination,
+                    job.departure.isoformat(),
+                    job.return_date.isoformat(),
+                    miles,
+                    cash,
+                    int(beats),
+                    _now(),
+                ),
+            )
+        if beats:
+            print(f"[ALERT] {provider} {job.origin}->{job.destination} {job.departure}: miles={miles} cash={cash}")
@@ -0,0 +1,619 @@
+import asyncio
+import datetime
+import json
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import arrow
+import numpy as np
+from curl_cffi import requests
+from rich import print
+from selenium_driverless import webdriver
+from selenium_driverless.scripts.network_interceptor import (
+    InterceptedRequest,
+    NetworkInterceptor,
+    RequestPattern,
+)
+
+try:
+    from .date_windows import date_pairs, format_dates, parse_date
+except ImportError:  # executed as a script from azul_scraper/
+    from date_windows import date_pairs, format_dates, parse_date
+
+try:
+    from scraper_common.records import FareRecord, FlightRecord
+    from scraper_common.upstream import DEFAULT_TIMEOUT, THROTTLED_STATUS_CODE, is_session_rejected
+except ImportError:  # executed as a script from azul_scraper/
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from scraper_common.records import FareRecord, FlightRecord
+    from scraper_common.upstream import DEFAULT_TIMEOUT, THROTTLED_STATUS_CODE, is_session_rejected
+
+# Headers from the captured browser request that must not be replayed
+DROPPED_HEADERS = {"content-length", "host", "connection", "accept-encoding", "user-agent"}
+
+
+def fare_price(fare, price_keys):
+    """Return the first numeric price field of a fare, or None"""
+    return next(
+        (fare[key] for key in price_keys if isinstance(fare.get(key), (int, float))),
+        None,
+    )
+
+
+def extract_trip_flights(trip, price_keys, in_miles):
+    """
+    Flights of the first flight date of a trip as compact records
+
+    Args:
+        trip (dict): One entry of data.trips
+        price_keys (tuple): Fare fields holding the price
+        in_miles (bool): Whether the price is in points (else in BRL)
+
+    Returns:
+        list: FlightRecord entries with their price per fare
+    """
+    flight_dates = trip.get("flightDates") or []
+    first_date = flight_dates[0] if flight_dates else None
+    if not isinstance(first_date, dict):
+        return []
+
+    flights = []
+    for flight in first_date.get("flights", []) or []:
+        if not isinstance(flight, dict):
+            continue
+        fares = []
+        for fare in flight.get("fares", []) or []:
+            if not isinstance(fare, dict):
+                continue
+            price = fare_price(fare, price_keys)
+            if price is None:
+                continue
+            name = fare.get("fareName", "Unknown")
+            fares.append(
+                FareRecord(name, price, None) if in_miles else FareRecord(name, None, price)
+            )
+        flights.append(
+            FlightRecord(
+                flight.get("flightNumber", "Unknown"),
+                flight.get("departureTime", "Unknown"),
+                flight.get("arrivalTime", "Unknown"),
+                flight.get("duration", "Unknown"),
+                tuple(fares),
+            )
+        )
+    return flights
+
+
+def _flight_date_day(flight_date):
+    """Return the YYYY-MM-DD day of a flightDates entry, or None when absent/invalid"""
+    for key in ("departureDate", "date"):
+        value = flight_date.get(key)
+        if isinstance(value, str) and len(value) >= 10:
+            try:
+                return datetime.date.fromisoformat(value[:10]).isoformat()
+            except ValueError:
+                return None
+    return None
+
+
+def lowest_price_by_date(trip, price_keys):
+    """
+    Lowest fare for every flight date of a trip
+
+    The availability search asks for +/-3 days (f.dl=3, f.dr=3), so each trip
+    carries one flightDates entry per day around the requested date.
+
+    Args:
+        trip (dict): One entry of data.trips
+        price_keys (tuple): Fare fields holding the price
+
+    Returns:
+        dict: {"YYYY-MM-DD": lowest price}, days without a priced fare are omitted
+    """
+    prices = {}
+    if not isinstance(trip, dict):
+        return prices
+    for flight_date in trip.get("flightDates") or []:
+        if not isinstance(flight_date, dict):
+            continue
+        day = _flight_date_day(flight_date)
+        if day is None:
+            continue
+        for flight in flight_date.get("flights") or []:
+            if not isinstance(flight, dict):
+                continue
+            for fare in flight.get("fares") or []:
+                if not isinstance(fare, dict):
+                    continue
+                for key in price_keys:
+                    value = fare.get(key)
+                    if isinstance(value, (int, float)) and value < prices.get(day, float("inf")):
+                        prices[day] = value
+    return prices
+
+
+def extract_trips_info(response_data, price_keys, lowest_key, in_miles):
+    """
+    Extract flights and prices of the outbound and inbound trips
+
+    Args:
+        response_data: API response with flight data
+        price_keys (tuple): Fare fields holding the price
+        lowest_key (str): fareInformation field with the trip's lowest price
+        in_miles (bool): Whether the prices are in points (else in BRL)
+
+    Returns:
+        dict: Dictionary with flight information
+    """
+    try:
+        # Check if the response has a valid structure
+        if "data" not in response_data or "trips" not in response_data["data"]:
+            print("Missing data or trips in response")
+            return {"error": "Invalid response structure"}
+
+        trips = response_data["data"]["trips"]
+        if len(trips) < 2:
+            print(f"Not enough trips in response. Found: {len(trips)}")
+            return {"error": "Not enough trip data"}
+
+        outbound_trip = trips[0] if isinstance(trips[0], dict) else {}
+        inbound_trip = trips[1] if isinstance(trips[1], dict) else {}
+
+        result = {
+            "outbound_flights": extract_trip_flights(outbound_trip, price_keys, in_miles),
+            "inbound_flights": extract_trip_flights(inbound_trip, price_keys, in_miles),
+            "lowest_outbound": outbound_trip.get("fareInformation", {}).get(
+                lowest_key, float("inf")
+            ),
+            "lowest_inbound": inbound_trip.get("fareInformation", {}).get(
+                lowest_key, float("inf")
+            ),
+            "outbound_by_date": lowest_price_by_date(outbound_trip, price_keys),
+            "inbound_by_date": lowest_price_by_date(inbound_trip, price_keys),
+        }
+
+        if (
+            not result["outbound_flights"]
+            and not result["inbound_flights"]
+            and result["lowest_outbound"] == float("inf")
+            and result["lowest_inbound"] == float("inf")
+        ):
+            print("No flight details or prices available in response")
+
+        return result
+
+    except Exception as e:
+        print(f"Error extracting flight info: {str(e)}")
+        return {"error": f"Data extraction error: {str(e)}"}
+
+
+class AzulFlightSearch:
+    """
+    Availability search shared by the Azul points and cash scrapers.
+
+    Subclasses only set the currency of the search page, the API endpoint
+    they intercept and the fields their prices are read from.
+    """
+
+    # "PTS" for points, "BRL" for cash
+    CURRENCY = None
+    # Substring of the availability request URL captured from the browser
+    AVAILABILITY_PATH = None
+    # Endpoint used when the browser did not reveal the current one
+    FALLBACK_API_URL = None
+    # Fare fields carrying the price
+    PRICE_KEYS = ()
+    # fareInformation field with a trip's lowest price
+    LOWEST_PRICE_KEY = None
+    IN_MILES = False
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, browser_pool=None):
+        # (connect, read) seconds for upstream calls; None disables the limit
+        self.timeout = timeout
+        # Optional shared pool of warm browsers (see api/browser_pool.py)
+        self.browser_pool = browser_pool
+        self.requests_headers = None
+        self.requests_body_template = None
+        self.api_url = None
+        self.last_timings = {}
+
+    def extract_flight_info(self, response_data):
+        """
+        Extract all flights and their prices from the response data
+        """
+        return extract_trips_info(
+            response_data, self.PRICE_KEYS, self.LOWEST_PRICE_KEY, self.IN_MILES
+        )
+
+    def create_flight_search_url(
+        self, origin, destination, departure_date, return_date
+    ):
+        """
+        Create Azul search URL with the given parameters
+
+        Args:
+            origin (str): Origin airport code (e.g., 'BEL')
+            destination (str): Destination airport code (e.g., 'GRU')
+            departure_date (str): Departure date in format 'MM/DD/YYYY'
+            return_date (str): Return date in format 'MM/DD/YYYY'
+
+        Returns:
+            str: Complete search URL
+        """
+        base_url = "https://www.voeazul.com.br/br/pt/home/selecao-voo"
+
+        # Build query parameters
+        params = [
+            f"c[0].ds={origin}",
+            f"c[0].std={departure_date}",
+            f"c[0].as={destination}",
+            f"c[1].ds={destination}",
+            f"c[1].std={return_date}",
+            f"c[1].as={origin}",
+            "p[0].t=ADT",
+            "p[0].c=1",
+            "p[0].cp=false",
+            "f.dl=3",
+            "f.dr=3",
+            f"cc={self.CURRENCY}",
+        ]
+
+        # Join parameters and add timestamp
+        query_string = "&".join(params)
+        timestamp = str(int(time.time() * 1000))
+
+        # Construct final URL
+        final_url = f"{base_url}?{query_string}&{timestamp}"
+
+        return final_url
+
+    async def _on_request(self, data: InterceptedRequest):
+        if (
+            self.AVAILABILITY_PATH in data.request.url
+            and data.request.method == "POST"
+        ):
+            self.requests_headers = data.request.headers
+            self.requests_body_template = json.loads(data.request.post_data)
+            self.api_url = data.request.url
+
+    @asynccontextmanager
+    async def _capture_page(self):
+        """
+        Yield (page, intercept_target) for a capture: an isolated context from the
+        shared browser pool when one was given, otherwise a dedicated Chrome
+        """
+        if self.browser_pool is not None:
+            async with self.browser_pool.context() as context:
+                yield context, context.current_target
+        else:
+            options = webdriver.ChromeOptions().add_argument("--headless=new")
+            async with webdriver.Chrome(options=options) as driver:
+                yield driver, driver
+
+    async def initialize_headers(
+        self, origin, destination, departure_date, return_date
+    ):
+        """
+        Initialize headers by opening the browser just once
+        """
+        if (
+            self.requests_headers is not None
+            and self.requests_body_template is not None
+            and self.api_url is not None
+        ):
+            return  # Already initialized
+
+        url = self.create_flight_search_url(
+            origin, destination, departure_date, return_date
+        )
+        print("Opening browser to initialize headers...")
+        async with self._capture_page() as (page, intercept_target):
+            async with NetworkInterceptor(
+                intercept_target,
+                on_request=self._on_request,
+                patterns=[RequestPattern.AnyRequest],
+            ) as _:
+                asyncio.ensure_future(page.get(url))
+                await page.sleep(15)
+
+        if not self.requests_headers or not self.requests_body_template:
+            print(
+                "Warning: Could not capture request headers/body. The browser might not have intercepted the API call."
+            )
+        else:
+            print("Headers initialized successfully")
+
+    def invalidate_session(self):
+        """
+        Drop the captured session so the next initialize_headers call opens the browser again
+        """
+        self.requests_headers = None
+        self.requests_body_template = None
+        self.api_url = None
+
+    def export_session(self):
+        """
+        Captured session as a JSON-serializable dict, for reuse by other processes
+
+        Returns:
+            dict: Headers, body template and API URL, or None when nothing was captured
+        """
+        if self.requests_headers is None or self.requests_body_template is None:
+            return None
+        return {
+            "headers": dict(self.requests_headers),
+            "body_template": self.requests_body_template,
+            "api_url": self.api_url,
+        }
+
+    def load_session(self, session):
+        """
+        Adopt a session exported by export_session (possibly from another process)
+
+        Args:
+            session (dict): Value returned by export_session
+        """
+        self.requests_headers = session["headers"]
+        self.requests_body_template = session["body_template"]
+        self.api_url = session.get("api_url")
+
+    def _update_request_body(self, origin, destination, departure_date, return_date):
+        """
+        Update the request body template with new dates
+        """
+        if not self.requests_body_template:
+            raise ValueError("Headers not initialized. Call initialize_headers first.")
+
+        # Make a deep copy to avoid modifying the template
+        body = json.loads(json.dumps(self.requests_body_template))
+
+        # Format dates for API (YYYY-MM-DD format)
+        # Convert MM/DD/YYYY to YYYY-MM-DD
+        dep_date_obj = arrow.get(departure_date, "MM/DD/YYYY")
+        ret_date_obj = arrow.get(return_date, "MM/DD/YYYY")
+        dep_date_api = dep_date_obj.format("YYYY-MM-DD")
+        ret_date_api = ret_date_obj.format("YYYY-MM-DD")
+
+        # Update the dates in the request body
+        try:
+            # Check the structure of the body and update accordingly
+            if "criteria" in body:
+                # Update criteria-based structure
+                if len(body["criteria"]) >= 2:
+                    # Update outbound
+                    body["criteria"][0]["departureStation"] = origin
+                    body["criteria"][0]["arrivalStation"] = destination
+                    body["criteria"][0]["std"] = departure_date
+                    body["criteria"][0]["departureDate"] = dep_date_api
+
+                    # Update inbound
+                    body["criteria"][1]["departureStation"] = destination
+                    body["criteria"][1]["arrivalStation"] = origin
+                    body["criteria"][1]["std"] = return_date
+                    body["criteria"][1]["departureDate"] = ret_date_api
+                else:
+                    print("Warning: criteria array does not have enough entries")
+            elif "trips" in body:
+                # Original trips-based structure (keep as fallback)
+                for i, trip in enumerate(body["trips"]):
+                    if i == 0:  # Outbound
+                        trip["origin"] = origin
+                        trip["destination"] = destination
+                        trip["departureDate"] = dep_date_api
+                    elif i == 1:  # Inbound
+                        trip["origin"] = destination
+                        trip["destination"] = origin
+                        trip["departureDate"] = ret_date_api
+            else:
+                print("Warning: Could not identify the structure of the request body")
+                print(f"Body keys: {list(body.keys())}")
+
+        except (KeyError, IndexError) as e:
+            print(f"Error updating request body: {e}")
+            print(f"Request body structure: {json.dumps(body, indent=2)}")
+            raise ValueError(f"Could not update request body: {e}")
+
+        return body
+
+    def _cleaned_headers(self):
+        """
+        Captured headers without the ones curl_cffi must set itself
+        """
+        cleaned_headers = {}
+        for k, v in self.requests_headers.items():
+            if k.startswith(":"):
+                continue
+            if k.lower() in DROPPED_HEADERS:
+                continue
+            if k.lower().startswith("sec-ch-ua"):
+                continue
+            cleaned_headers[k] = v
+        return cleaned_headers
+
+    async def get_flight_info(self, origin, destination, departure_date, return_date):
+        """
+        Get flight information using pre-initialized headers
+        """
+        if not self.requests_headers:
+            await self.initialize_headers(
+                origin, destination, departure_date, return_date
+            )
+        # The curl_cffi call blocks; keep it off the event loop
+        return await asyncio.to_thread(
+            self.fetch_flight_info, origin, destination, departure_date, return_date
+        )
+
+    def fetch_flight_info(self, origin, destination, departure_date, return_date):
+        """
+        Blocking availability request with the captured session
+
+        Args:
+            origin (str): Origin airport code
+            destination (str): Destination airport code
+            departure_date (str): Departure date in MM/DD/YYYY format
+            return_date (str): Return date in MM/DD/YYYY format
+
+        Returns:
+            dict: API response, or {"error": ...} (flagged throttled/session_rejected when so)
+        """
+        self.last_timings = {}
+        try:
+            # Update request body with new dates
+            request_body = self._update_request_body(
+                origin, destination, departure_date, return_date
+            )
+
+            # Use captured API URL or fallback to v6
+            api_url = self.api_url or self.FALLBACK_API_URL
+
+            http_start = time.perf_counter()
+            resp = requests.post(
+                url=api_url,
+                headers=self._cleaned_headers(),
+                json=request_body,
+                impersonate="chrome124",
+                timeout=self.timeout,
+            )
+            self.last_timings["http"] = time.perf_counter() - http_start
+
+            if resp.status_code == THROTTLED_STATUS_CODE:
+                print(f"Rate limited by Azul. Status: {resp.status_code}")
+                return {
+                    "error": f"Rate limited. Status: {resp.status_code}",
+                    "throttled": True,
+                }
+
+            if is_session_rejected(resp):
+                print(f"Session rejected by Azul. Status: {resp.status_code}")
+                return {
+                    "error": f"Session rejected. Status: {resp.status_code}",
+                    "session_rejected": True,
+                }
+
+            parse_start = time.perf_counter()
+            try:
+                response_data = resp.json()
+            except json.JSONDecodeError:
+                print(f"Failed to parse JSON response. Status: {resp.status_code}")
+                print(f"Response text: {resp.text[:500]}...")  # Print first 500 chars
+                return {"error": f"Invalid JSON response. Status: {resp.status_code}"}
+            finally:
+                self.last_timings["parse"] = time.perf_counter() - parse_start
+
+            if "data" not in response_data:
+                print(
+                    f"Warning: Response missing 'data' field. Status code: {resp.status_code}"
+                )
+                print(f"Response preview: {str(response_data)[:200]}...")
+                return {
+                    "error": f"Invalid API response (no data field). Status: {resp.status_code}"
+                }
+
+            return response_data
+
+        except Exception as e:
+            print(f"API request error: {str(e)}")
+            return {"error": f"API request failed: {str(e)}"}
+
+    async def search_date_range(
+        self,
+        origin,
+        destination,
+        base_departure_date,
+        base_return_date,
+        width=2,
+        departure_weekdays=None,
+        return_weekdays=None,
+        min_stay=0,
+        max_stay=None,
+    ):
+        """
+        Search flights for a range of dates around the base dates
+
+        Only the (departure, return) pairs allowed by the window width, the
+        weekdays and the stay length are considered. The grid is filled from
+        the flexible-date columns of a single availability response; only
+        combinations the response does not cover are searched one by one.
+
+        Args:
+            origin (str): Origin airport code
+            destination (str): Destination airport code
+            base_departure_date (str): Base departure date in MM/DD/YYYY format
+            base_return_date (str): Base return date in MM/DD/YYYY format
+            width (int): Days searched on each side of each base date
+            departure_weekdays (iterable, optional): Allowed departure weekdays (Monday = 0)
+            return_weekdays (iterable, optional): Allowed return weekdays (Monday = 0)
+            min_stay (int): Minimum nights between departure and return
+            max_stay (int, optional): Maximum nights between departure and return
+
+        Returns:
+            dict: Results with lowest prices for each valid date combination
+        """
+        departures, returns = date_pairs(
+            parse_date(base_departure_date),
+            parse_date(base_return_date),
+            width=width,
+            departure_weekdays=departure_weekdays,
+            return_weekdays=return_weekdays,
+            min_stay=min_stay,
+            max_stay=max_stay,
+            earliest=np.datetime64(datetime.date.today(), "D"),
+        )
+        pairs = zip(
+            format_dates(departures),
+            format_dates(returns),
+            format_dates(departures, "YYYY-MM-DD"),
+            format_dates(returns, "YYYY-MM-DD"),
+        )
+
+        # Initialize headers just once
+        await self.initialize_headers(
+            origin, destination, base_departure_date, base_return_date
+        )
+
+        print(
+            f"Searching for {origin} to {destination}: {base_departure_date} -> {base_return_date} (flexible dates)"
+        )
+        flight_data = await self.get_flight_info(
+            origin, destination, base_departure_date, base_return_date
+        )
+        flight_info = (
+            flight_data if "error" in flight_data else self.extract_flight_info(flight_data)
+        )
+        outbound_by_date = flight_info.get("outbound_by_date") or {}
+        inbound_by_date = flight_info.get("inbound_by_date") or {}
+
+        results = {}
+
+        for dep_date, ret_date, dep_day, ret_day in pairs:
+            results.setdefault(dep_date, {})
+            if dep_day in outbound_by_date and ret_day in inbound_by_date:
+                results[dep_date][ret_date] = {
+                    "lowest_outbound": outbound_by_date[dep_day],
+                    "lowest_inbound": inbound_by_date[ret_day],
+                }
+                continue
+
+            try:
+                print(
+                    f"Searching for {origin} to {destination}: {dep_date} -> {ret_date}"
+                )
+                flight_data = await self.get_flight_info(
+                    origin, destination, dep_date, ret_date
+                )
+
+                if "error" in flight_data:
+                    results[dep_date][ret_date] = flight_data
+                else:
+                    results[dep_date][ret_date] = self.extract_flight_info(flight_data)
+
+            except Exception as e:
+                print(f"Error searching {dep_date} -> {ret_date}: {str(e)}")
+                results[dep_date][ret_date] = {"error": str(e)}
+
+            # Small delay to prevent rate limiting
+            await asyncio.sleep(2)
+
+        return results
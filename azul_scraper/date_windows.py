@@ -0,0 +1,127 @@
+import re
+
+import numpy as np
+
+
+# Date tokens understood by format_dates (the arrow-style ones used by the scrapers)
+_DATE_TOKENS = re.compile(r"YYYY|MM|DD")
+
+# 1970-01-01, day 0 of datetime64[D], was a Thursday (Monday = 0)
+_EPOCH_WEEKDAY = 3
+
+
+def parse_date(date_str, format_str="MM/DD/YYYY"):
+    """
+    Parse a date string written with YYYY/MM/DD tokens
+
+    Args:
+        date_str (str): Date such as '01/30/2026'
+        format_str (str): Format of the date string
+
+    Returns:
+        numpy.datetime64: The day, with day precision
+    """
+    pattern = _DATE_TOKENS.sub(
+        lambda token: f"(?P<{token.group(0)}>\\d{{{len(token.group(0))}}})",
+        re.escape(format_str),
+    )
+    match = re.fullmatch(pattern, date_str.strip())
+    if match is None:
+        raise ValueError(f"Date {date_str!r} does not match format {format_str!r}")
+    return np.datetime64(f"{match['YYYY']}-{match['MM']}-{match['DD']}", "D")
+
+
+def format_dates(days, format_str="MM/DD/YYYY"):
+    """
+    Format an array of days without a Python-level loop per date
+
+    Args:
+        days (numpy.ndarray): datetime64[D] values
+        format_str (str): Output format built from YYYY, MM and DD
+
+    Returns:
+        list: Date strings in the requested format
+    """
+    days = np.asarray(days, dtype="datetime64[D]")
+    months = days.astype("datetime64[M]")
+    parts = {
+        "YYYY": np.char.mod("%04d", days.astype("datetime64[Y]").astype(np.int64) + 1970),
+        "MM": np.char.mod("%02d", months.astype(np.int64) % 12 + 1),
+        "DD": np.char.mod("%02d", (days - months).astype(np.int64) + 1),
+    }
+    formatted = np.full(days.shape, "", dtype="<U1")
+    position = 0
+    for token in _DATE_TOKENS.finditer(format_str):
+        formatted = np.char.add(np.char.add(formatted, format_str[position:token.start()]), parts[token.group(0)])
+        position = token.end()
+    return np.char.add(formatted, format_str[position:]).tolist()
+
+
+def weekday(days):
+    """
+    Day of the week of each day (Monday = 0 ... Sunday = 6), like date.weekday()
+    """
+    return (np.asarray(days, dtype="datetime64[D]").astype(np.int64) + _EPOCH_WEEKDAY) % 7
+
+
+def date_window(base_day, width=2, weekdays=None):
+    """
+    Days from width days before to width days after base_day
+
+    Args:
+        base_day (numpy.datetime64): Center of the window
+        width (int): Days on each side of the base day
+        weekdays (iterable, optional): Allowed weekdays (Monday = 0); all when None
+
+    Returns:
+        numpy.ndarray: datetime64[D] days in ascending order
+    """
+    days = np.datetime64(base_day, "D") + np.arange(-width, width + 1)
+    if weekdays is not None:
+        days = days[np.isin(weekday(days), list(weekdays))]
+    return days
+
+
+def date_pairs(
+    base_departure,
+    base_return,
+    width=2,
+    departure_weekdays=None,
+    return_weekdays=None,
+    min_stay=0,
+    max_stay=None,
+    earliest=None,
+):
+    """
+    Valid (departure, return) combinations around the base dates
+
+    Both windows are built as datetime64 arrays and the whole departure x
+    return grid is filtered at once: returns before min_stay days after the
+    departure, stays longer than max_stay and departures before earliest are
+    dropped, so callers only search combinations that can exist.
+
+    Args:
+        base_departure (numpy.datetime64): Base departure day
+        base_return (numpy.datetime64): Base return day
+        width (int): Days searched on each side of each base date
+        departure_weekdays (iterable, optional): Allowed departure weekdays (Monday = 0)
+        return_weekdays (iterable, optional): Allowed return weekdays (Monday = 0)
+        min_stay (int): Minimum nights between departure and return
+        max_stay (int, optional): Maximum nights between departure and return
+        earliest (numpy.datetime64, optional): First day a departure may be on
+
+    Returns:
+        tuple: (departures, returns) aligned datetime64[D] arrays, ordered by
+        departure and then return
+    """
+    departures = date_window(base_departure, width, departure_weekdays)
+    returns = date_window(base_return, width, return_weekdays)
+    if earliest is not None:
+        departures = departures[departures >= np.datetime64(earliest, "D")]
+
+    stays = (returns[np.newaxis, :] - departures[:, np.newaxis]).astype(np.int64)
+    valid = stays >= min_stay
+    if max_stay is not None:
+        valid &= stays <= max_stay
+    departure_index, return_index = np.nonzero(valid)
+    return departures[departure_index], returns[return_index]
@@ -0,0 +1,3 @@
+"""
+Pieces shared by the Azul and Smiles scrapers.
+"""
@@ -0,0 +1,23 @@
+"""
+Compact flight records returned by every scraper's extraction.
+"""
+
+from typing import NamedTuple, Optional, Tuple
+
+
+class FareRecord(NamedTuple):
+    """One fare family of a flight; the price kind the search does not return is None"""
+
+    name: str
+    miles: Optional[float]
+    money: Optional[float]
+
+
+class FlightRecord(NamedTuple):
+    """Compact, tuple-based flight entry (no per-instance dict)"""
+
+    flight_number: str
+    departure: str
+    arrival: str
+    duration: str
+    fares: Tuple[FareRecord, ...]
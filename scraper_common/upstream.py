@@ -0,0 +1,25 @@
+"""
+How the scrapers call the airline APIs and read their refusals.
+"""
+
+# (connect, read) seconds for upstream calls
+DEFAULT_TIMEOUT = (10, 30)
+
+REJECTED_STATUS_CODES = {401, 403}
+
+THROTTLED_STATUS_CODE = 429
+
+
+def is_session_rejected(resp):
+    """
+    Tell whether the provider refused the captured session.
+
+    Akamai answers expired or flagged sessions with 401/403 or with an HTML
+    challenge page instead of the JSON payload.
+    """
+    if resp.status_code in REJECTED_STATUS_CODES:
+        return True
+    content_type = resp.headers.get("content-type") or ""
+    if "text/html" in content_type.lower():
+        return True
+    return resp.text[:64].lstrip().startswith("<")
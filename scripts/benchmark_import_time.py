@@ -0,0 +1,138 @@
+"""
+Mede o tempo de inicialização a frio (import) da API e dos scripts.
+
+Cada alvo é importado em um processo Python novo, várias vezes, e o script
+reporta a mediana e o pior tempo, além de quais módulos pesados do scraping
+(selenium_driverless, curl_cffi, arrow, rich) foram carregados. Com
+``--importtime`` também lista os módulos que mais pesaram (``python -X importtime``).
+
+Uso:
+    python scripts/benchmark_import_time.py --repeat 5
+    python scripts/benchmark_import_time.py --max-seconds 1.5   # falha se algum alvo passar do limite
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ("selenium_driverless", "curl_cffi", "arrow", "rich")
+
+# Código executado no processo filho: importa o alvo e devolve o tempo e os módulos pesados carregados
+PROBE = """
+import json, runpy, sys, time
+start = time.perf_counter()
+kind, target = sys.argv[1], sys.argv[2]
+if kind == "module":
+    __import__(target)
+else:
+    runpy.run_path(target, run_name="__benchmark__")
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [name for name in %r if name in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+class Target(NamedTuple):
+    label: str
+    kind: str  # "module" ou "script"
+    target: str
+    env: Dict[str, str]
+
+
+TARGETS: Tuple[Target, ...] = (
+    Target("api.main", "module", "api.main", {}),
+    Target("api.main (TCC_API_MODE=history)", "module", "api.main", {"TCC_API_MODE": "history"}),
+    Target("scripts/migrate_csv_to_sqlite.py", "script", "scripts/migrate_csv_to_sqlite.py", {}),
+)
+
+
+def run_probe(target: Target) -> Tuple[float, List[str]]:
+    """Importa o alvo em um processo novo e retorna (segundos, módulos pesados carregados)."""
+    env = {**os.environ, **target.env}
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE, target.kind, target.target],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # A última linha é a do probe; o alvo pode imprimir algo antes
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result["seconds"], result["heavy"]
+
+
+def top_imports(target: Target, limit: int) -> List[Tuple[int, str]]:
+    """Módulos com maior tempo cumulativo segundo ``python -X importtime`` (microssegundos, nome)."""
+    env = {**os.environ, **target.env}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, target.kind, target.target],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries: List[Tuple[int, str]] = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        # Só os dois primeiros níveis, para a lista não se repetir por submódulo
+        depth = len(name) - len(name.lstrip())
+        if depth <= 3 and name.strip() != target.target:
+            entries.append((int(cumulative), name.strip()))
+    entries.sort(reverse=True)
+    return entries[:limit]
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Processos novos por alvo (padrão: 5).")
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="Sai com código 1 se a mediana de algum alvo passar deste limite.",
+    )
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="Lista os N imports mais lentos de cada alvo.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    over_budget = []
+    for target in TARGETS:
+        # A primeira execução só aquece o cache de bytecode e do sistema de arquivos
+        run_probe(target)
+        samples = []
+        heavy: List[str] = []
+        for _ in range(max(1, args.repeat)):
+            seconds, heavy = run_probe(target)
+            samples.append(seconds)
+        median = statistics.median(samples)
+        print(
+            f"{target.label:<40} mediana {median * 1000:8.1f} ms   pior {max(samples) * 1000:8.1f} ms   "
+            f"scraping: {', '.join(heavy) if heavy else '-'}"
+        )
+        for cumulative, name in top_imports(target, args.importtime) if args.importtime else []:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+        if args.max_seconds is not None and median > args.max_seconds:
+            over_budget.append(target.label)
+
+    if over_budget:
+        print(f"Acima do limite de {args.max_seconds}s: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -32,6 +32,11 @@ class HistoricalRow:
     outbound_cash: Optional[float]
     inbound_cash: Optional[float]
     total_cash: Optional[float]
+    airlines: Optional[str]
+    program: Optional[str]
+    price_per_mile: Optional[float]
+    cash_fare: Optional[float]
+    savings_pct: Optional[float]
 
     def as_tuple(self) -> tuple:
         return (
@@ -45,6 +50,11 @@ class HistoricalRow:
             self.outbound_cash,
             self.inbound_cash,
             self.total_cash,
+            self.airlines,
+            self.program,
+            self.price_per_mile,
+            self.cash_fare,
+            self.savings_pct,
         )
 
 
@@ -91,6 +101,24 @@ def normalize_money(value: Optional[str]) -> Optional[float]:
     return float(amount)
 
 
+def normalize_decimal(value: Optional[str]) -> Optional[float]:
+    """Converte valores como 'R$ 0.019' ou '50.57%' (ponto decimal, vírgula de milhar)."""
+    if value is None:
+        return None
+    cleaned = "".join(ch for ch in value if ch.isdigit() or ch in ".-")
+    if not cleaned:
+        return None
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def normalize_text(value: Optional[str]) -> Optional[str]:
+    cleaned = (value or "").strip()
+    return cleaned or None
+
+
 def normalize_month(value: Optional[str], pick_last: bool = False) -> Optional[int]:
     if not value:
         return None
@@ -156,6 +184,11 @@ def build_row(raw: dict) -> Optional[HistoricalRow]:
         outbound_cash=normalize_money(raw.get("Ida-Real")),
         inbound_cash=normalize_money(raw.get("Volta-Real")),
         total_cash=normalize_money(raw.get("Total-Real")),
+        airlines=normalize_text(raw.get("Cias-Aéreas")),
+        program=normalize_text(raw.get("Clube-Milhas")),
+        price_per_mile=normalize_decimal(raw.get("Milheiro")),
+        cash_fare=normalize_money(raw.get("Valor-Real")),
+        savings_pct=normalize_decimal(raw.get("Economia %")),
     )
 
 
@@ -174,7 +207,12 @@ def ensure_schema(conn: sqlite3.Connection) -> None:
             total_miles INTEGER,
             outbound_cash REAL,
             inbound_cash REAL,
-            total_cash REAL
+            total_cash REAL,
+            airlines TEXT,
+            program TEXT,
+            price_per_mile REAL,
+            cash_fare REAL,
+            savings_pct REAL
         )
         """
     )
@@ -193,8 +231,13 @@ def insert_rows(conn: sqlite3.Connection, rows: Sequence[HistoricalRow]) -> None
             total_miles,
             outbound_cash,
             inbound_cash,
-            total_cash
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            total_cash,
+            airlines,
+            program,
+            price_per_mile,
+            cash_fare,
+            savings_pct
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         [row.as_tuple() for row in rows],
     )
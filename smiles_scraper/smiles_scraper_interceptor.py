@@ -1,6 +1,11 @@
 import asyncio
 import json
+import sys
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
 
 from curl_cffi import requests
 from rich import print
@@ -11,6 +16,95 @@ from selenium_driverless.scripts.network_interceptor import (
     RequestPattern,
 )
 
+try:
+    from scraper_common.records import FareRecord, FlightRecord
+    from scraper_common.upstream import DEFAULT_TIMEOUT, THROTTLED_STATUS_CODE, is_session_rejected
+except ImportError:  # executed as a script from smiles_scraper/
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from scraper_common.records import FareRecord, FlightRecord
+    from scraper_common.upstream import DEFAULT_TIMEOUT, THROTTLED_STATUS_CODE, is_session_rejected
+
+# Resource types the Akamai cookies do not depend on; blocked in headless captures
+BLOCKED_RESOURCE_TYPES = {
+    "Image",
+    "Media",
+    "Font",
+    "Stylesheet",
+    "Ping",
+    "Manifest",
+    "CSPViolationReport",
+}
+
+# Third-party analytics, ads and chat widgets loaded by the Smiles page
+BLOCKED_TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "bing.com",
+    "tiktok.com",
+    "tiktokw.us",
+    "pinterest.com",
+    "pinimg.com",
+    "criteo.com",
+    "criteo.net",
+    "voxus.com.br",
+    "advcake.com",
+    "lomadee.com",
+    "fullstory.com",
+    "amplitude.com",
+    "zopim.com",
+    "zendesk.com",
+    "cookielaw.org",
+    "onetrust.com",
+)
+
+# Akamai Bot Manager cookies the search API actually validates
+AKAMAI_COOKIE_KEYS = {"_abck", "bm_sz", "bm_sv", "bm_s", "bm_so", "bm_ss", "ak_bmsc"}
+
+
+def _format_duration(duration):
+    """Render Smiles' {"hours": h, "minutes": m} durations as "HHhMM"."""
+    if isinstance(duration, dict):
+        return f"{duration.get('hours', 0):02d}h{duration.get('minutes', 0):02d}"
+    return str(duration) if duration is not None else "Unknown"
+
+
+def extract_segment_flights(segment):
+    """
+    Flights of a requested segment as compact records
+
+    Args:
+        segment (dict): One entry of requestedFlightSegmentList
+
+    Returns:
+        list: FlightRecord entries with miles and money per fare
+    """
+    flights = []
+    for flight in segment.get("flightList", []) or []:
+        if not isinstance(flight, dict):
+            continue
+        legs = flight.get("legList") or [{}]
+        fares = tuple(
+            FareRecord(fare.get("type", "Unknown"), fare.get("miles"), fare.get("money"))
+            for fare in flight.get("fareList", []) or []
+            if isinstance(fare, dict)
+        )
+        flights.append(
+            FlightRecord(
+                flight.get("flightNumber") or legs[0].get("flightNumber", "Unknown"),
+                (flight.get("departure") or {}).get("date", "Unknown"),
+                (flight.get("arrival") or {}).get("date", "Unknown"),
+                _format_duration(flight.get("duration")),
+                fares,
+            )
+        )
+    return flights
+
 
 def extract_flight_info(response_data):
     """
@@ -41,6 +135,8 @@ def extract_flight_info(response_data):
             "lowest_outbound_money": outbound_pricing.get("money", float("inf")),
             "lowest_inbound_miles": inbound_pricing.get("miles", float("inf")),
             "lowest_inbound_money": inbound_pricing.get("money", float("inf")),
+            "outbound_flights": extract_segment_flights(segments[0]),
+            "inbound_flights": extract_segment_flights(segments[1]),
         }
 
         # Also include smilesMoney option if available (miles + money combo)
@@ -64,12 +160,26 @@ def extract_flight_info(response_data):
 
 
 class SmilesFlightSearch:
-    def __init__(self):
+    def __init__(
+        self,
+        timeout=DEFAULT_TIMEOUT,
+        browser_pool=None,
+        headless=False,
+        block_resources=None,
+    ):
+        # (connect, read) seconds for upstream calls; None disables the limit
+        self.timeout = timeout
+        # Optional shared pool of warm browsers (see api/browser_pool.py)
+        self.browser_pool = browser_pool
+        # Headless captures block non-essential resources unless told otherwise
+        self.headless = headless
+        self.block_resources = headless if block_resources is None else block_resources
         self.requests_headers = None
         self.requests_cookies = None
         self._max_cookie_keys = 0
         self._cookie_source_url = None
         self.api_base_url = None
+        self.last_timings = {}
 
     def _get_intercepted_header(self, header_name, default=None):
         """Return sanitized header captured from the browser session."""
@@ -142,9 +252,23 @@ class SmilesFlightSearch:
 
         return final_url
 
+    def _should_block(self, data: InterceptedRequest):
+        """Tell whether a request is irrelevant for obtaining the Akamai cookies"""
+        if data.resource_type in BLOCKED_RESOURCE_TYPES:
+            return True
+        host = urlsplit(data.request.url or "").hostname or ""
+        return any(
+            host == domain or host.endswith("." + domain)
+            for domain in BLOCKED_TRACKER_DOMAINS
+        )
+
     async def _on_request(self, data: InterceptedRequest):
         """Intercept requests to capture headers and cookies"""
 
+        if self.block_resources and self._should_block(data):
+            await data.fail_request("BlockedByClient")
+            return
+
         if not data.request.headers:
             return
 
@@ -190,6 +314,38 @@ class SmilesFlightSearch:
         print(f"[SUCCESS] Cookie preview: {cookie_value[:150]}...")
         print("[SUCCESS] Headers and cookies captured successfully!")
 
+    @asynccontextmanager
+    async def _capture_page(self):
+        """
+        Yield (page, intercept_target) for a capture: an isolated context from the
+        shared browser pool when one was given, otherwise a dedicated Chrome
+        """
+        if self.browser_pool is not None:
+            async with self.browser_pool.context() as context:
+                yield context, context.current_target
+        else:
+            # Normal (headful) mode lets you see what's happening when debugging
+            options = webdriver.ChromeOptions()
+            if self.headless:
+                options.add_argument("--headless=new")
+            async with webdriver.Chrome(options=options) as driver:
+                yield driver, driver
+
+    def _has_validated_cookies(self):
+        """Both Akamai cookies captured and _abck no longer in its unvalidated (~-1~) state"""
+        cookies = self.requests_cookies or ""
+        if "bm_sz=" not in cookies or "_abck=" not in cookies:
+            return False
+        abck = cookies.split("_abck=", 1)[1].split(";", 1)[0]
+        return "~-1~" not in abck
+
+    async def _wait_for_cookies(self, page, timeout, poll_interval=0.5):
+        """Sleep until the cookies are validated or the timeout expires"""
+        waited = 0.0
+        while waited < timeout and not self._has_validated_cookies():
+            await page.sleep(poll_interval)
+            waited += poll_interval
+
     async def initialize_headers(
         self,
         origin,
@@ -207,27 +363,65 @@ class SmilesFlightSearch:
         url = self.create_flight_search_url(
             origin, destination, departure_date_timestamp, return_date_timestamp
         )
-        # Use normal (non-headless) mode so you can see what's happening
-        options = webdriver.ChromeOptions()
-
-        print("\nOpening browser in normal mode to capture cookies...")
-        print("The browser window will open - waiting for cookies...\n")
+        if self.headless:
+            print("\nOpening headless browser to capture cookies...")
+        else:
+            print("\nOpening browser in normal mode to capture cookies...")
+            print("The browser window will open - waiting for cookies...\n")
 
-        async with webdriver.Chrome(options=options) as driver:
+        async with self._capture_page() as (page, intercept_target):
             async with NetworkInterceptor(
-                driver,
+                intercept_target,
                 on_request=self._on_request,
                 patterns=[RequestPattern.AnyRequest],
             ) as _:
-                asyncio.ensure_future(driver.get(url))
-                # Wait just long enough to capture initial cookies
-                await driver.sleep(10)
+                asyncio.ensure_future(page.get(url))
+                # Wait just long enough to capture validated Akamai cookies
+                await self._wait_for_cookies(page, timeout=10)
 
         if not self.requests_headers:
             print("\nWarning: Could not capture headers and cookies.")
         else:
             print("\nHeaders and cookies initialized successfully!")
 
+    def invalidate_session(self):
+        """Forget the captured headers and cookies so the next capture starts from scratch."""
+        self.requests_headers = None
+        self.requests_cookies = None
+        self._max_cookie_keys = 0
+        self._cookie_source_url = None
+        self.api_base_url = None
+
+    def export_session(self):
+        """
+        Captured session as a JSON-serializable dict, for reuse by other processes
+
+        Returns:
+            dict: Headers, cookies and API URL, or None when nothing was captured
+        """
+        if self.requests_headers is None:
+            return None
+        return {
+            "headers": dict(self.requests_headers),
+            "cookies": self.requests_cookies,
+            "cookie_source_url": self._cookie_source_url,
+            "api_base_url": self.api_base_url,
+        }
+
+    def load_session(self, session):
+        """
+        Adopt a session exported by export_session (possibly from another process)
+
+        Args:
+            session (dict): Value returned by export_session
+        """
+        self.requests_headers = session["headers"]
+        self.requests_cookies = session.get("cookies")
+        self._cookie_source_url = session.get("cookie_source_url")
+        self.api_base_url = session.get("api_base_url")
+        cookie_pairs = [c for c in (self.requests_cookies or "").split(";") if "=" in c]
+        self._max_cookie_keys = len({c.strip().split("=", 1)[0] for c in cookie_pairs})
+
     def get_flight_info(
         self,
         origin,
@@ -255,6 +449,7 @@ class SmilesFlightSearch:
         Returns:
             dict: Response data from API
         """
+        self.last_timings = {}
         if not self.requests_headers:
             raise ValueError("Headers not initialized. Call initialize_headers first.")
 
@@ -377,12 +572,13 @@ class SmilesFlightSearch:
             print(f"[DEBUG] Necessary cookies for API: {len(cookies_dict)}")
             print(f"[DEBUG] Filtered cookie keys: {list(cookies_dict.keys())[:10]}...")
 
+            # Tracker cookies are expected to be missing when the capture blocks trackers
             missing_cookie_keys = [
-                k for k in necessary_cookie_keys if k not in cookies_dict
+                k for k in AKAMAI_COOKIE_KEYS if k not in cookies_dict
             ]
             if missing_cookie_keys:
                 print(
-                    f"[WARN] Missing {len(missing_cookie_keys)} cookies: {missing_cookie_keys[:5]}..."
+                    f"[WARN] Missing {len(missing_cookie_keys)} Akamai cookies: {missing_cookie_keys}"
                 )
 
             # Use captured API URL or default to blue
@@ -393,17 +589,36 @@ class SmilesFlightSearch:
             print(f"[DEBUG] Using API URL: {api_url}")
 
             # Pass cookies as a dictionary
+            http_start = time.perf_counter()
             resp = requests.get(
                 url=api_url,
                 params=params,
                 headers=headers,
                 cookies=cookies_dict,
                 impersonate="chrome120",
+                timeout=self.timeout,
             )
+            self.last_timings["http"] = time.perf_counter() - http_start
 
             print(f"[DEBUG] Response status code: {resp.status_code}")
 
+            if resp.status_code == THROTTLED_STATUS_CODE:
+                print(f"[WARN] Rate limited by Smiles. Status: {resp.status_code}")
+                return {
+                    "error": f"Rate limited. Status: {resp.status_code}",
+                    "throttled": True,
+                }
+
+            if is_session_rejected(resp):
+                print(f"[WARN] Session rejected by Smiles. Status: {resp.status_code}")
+                return {
+                    "error": f"Session rejected. Status: {resp.status_code}",
+                    "session_rejected": True,
+                }
+
+            parse_start = time.perf_counter()
             response_data = resp.json()
+            self.last_timings["parse"] = time.perf_counter() - parse_start
 
             if "requestedFlightSegmentList" not in response_data:
                 print(